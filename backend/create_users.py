@@ -6,28 +6,44 @@ from django.core.management import execute_from_command_line
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'prompt_library.settings')
 django.setup()
 
+from django.contrib.auth.hashers import make_password
 from django.contrib.auth.models import User
+from django.db import transaction
+
+USERS = [
+    {
+        'username': 'admin',
+        'password': 'admin123',
+        'label': 'Admin',
+        'defaults': {'email': 'admin@example.com', 'is_staff': True, 'is_superuser': True},
+    },
+    {
+        'username': 'user',
+        'password': 'user123',
+        'label': 'Regular',
+        'defaults': {'email': 'user@example.com', 'first_name': 'John', 'last_name': 'Doe'},
+    },
+]
 
 def create_users():
-    # Create admin user
-    admin, created = User.objects.get_or_create(
-        username='admin',
-        defaults={'email': 'admin@example.com', 'is_staff': True, 'is_superuser': True}
-    )
-    if created:
-        admin.set_password('admin123')
-        admin.save()
-        print('Admin user created')
-
-    # Create regular user
-    user, created = User.objects.get_or_create(
-        username='user',
-        defaults={'email': 'user@example.com', 'first_name': 'John', 'last_name': 'Doe'}
-    )
-    if created:
-        user.set_password('user123')
-        user.save()
-        print('Regular user created')
+    with transaction.atomic():
+        existing = set(
+            User.objects.filter(username__in=[u['username'] for u in USERS])
+            .values_list('username', flat=True)
+        )
+        new_users = [u for u in USERS if u['username'] not in existing]
+
+        # Only hash passwords for users that will actually be inserted
+        User.objects.bulk_create(
+            [
+                User(username=u['username'], password=make_password(u['password']), **u['defaults'])
+                for u in new_users
+            ],
+            ignore_conflicts=True
+        )
+
+    for u in new_users:
+        print(f"{u['label']} user created")
 
     print('Users created successfully')
 
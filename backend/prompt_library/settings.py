@@ -11,6 +11,7 @@ https://docs.djangoproject.com/en/4.2/ref/settings/
 """
 
 from pathlib import Path
+from urllib.parse import unquote, urlparse
 from datetime import timedelta
 import os
 
@@ -39,6 +40,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'rest_framework',
     'rest_framework_simplejwt',
     'corsheaders',
@@ -82,10 +84,21 @@ WSGI_APPLICATION = 'prompt_library.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/4.2/ref/settings/database/
 
+# PostgreSQL is required: full-text search and the array tags depend on it
+_database_url = urlparse(os.getenv('DATABASE_URL', 'postgresql://localhost:5432/prompt_library'))
+
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        'ENGINE': 'django.db.backends.postgresql',
+        'NAME': _database_url.path.lstrip('/'),
+        'USER': unquote(_database_url.username or ''),
+        'PASSWORD': unquote(_database_url.password or ''),
+        'HOST': _database_url.hostname or '',
+        'PORT': str(_database_url.port or ''),
+        # Reuse connections across requests instead of reconnecting for every one
+        # Each worker thread keeps its own, so the server must allow workers x threads connections
+        'CONN_MAX_AGE': int(os.getenv('DB_CONN_MAX_AGE', '60')),
+        'CONN_HEALTH_CHECKS': True,
     }
 }
 
@@ -211,6 +224,16 @@ os.makedirs(BASE_DIR / 'logs', exist_ok=True)
 OLLAMA_BASE_URL = os.getenv('OLLAMA_BASE_URL', 'http://localhost:11434')
 OLLAMA_DEFAULT_MODEL = os.getenv('OLLAMA_DEFAULT_MODEL', 'gpt-oss:20b')
 OLLAMA_TIMEOUT = int(os.getenv('OLLAMA_TIMEOUT', '1200'))  # 20 minutes timeout
+# Max concurrent generations sent to Ollama per process. Keep this in line with the
+# server-side OLLAMA_NUM_PARALLEL (and OLLAMA_MAX_LOADED_MODELS when several models
+# are in use) so requests queue here instead of degrading the server.
+OLLAMA_NUM_PARALLEL = int(os.getenv('OLLAMA_NUM_PARALLEL', '4'))
+OLLAMA_CACHE_TIMEOUT = int(os.getenv('OLLAMA_CACHE_TIMEOUT', '86400'))  # 24 hours cache for LLM responses
+# How long Ollama keeps a model loaded after a request. When several models are kept
+# resident, raise OLLAMA_MAX_LOADED_MODELS on the server so they don't evict each other.
+OLLAMA_KEEP_ALIVE = os.getenv('OLLAMA_KEEP_ALIVE', '30m')
+# Load the default model when a server process starts; management commands never preload
+OLLAMA_PRELOAD_MODEL = os.getenv('OLLAMA_PRELOAD_MODEL', 'False').lower() == 'true'
 
 # AI Features Configuration
 ENABLE_AI_SUGGESTIONS = os.getenv('ENABLE_AI_SUGGESTIONS', 'True').lower() == 'true'
@@ -323,7 +346,7 @@ if not DEBUG:
         'sslmode': 'require'
     }
 else:
-    # SQLite doesn't support SSL
+    # Local development databases usually run without SSL
     DATABASES['default'].pop('OPTIONS', None)
 
 # Logging security events
@@ -358,5 +381,9 @@ GUARDRAILS_CONFIG_PATH = os.path.join(BASE_DIR, 'guardrails_config')
 GUARDRAILS_ENABLED = os.getenv('GUARDRAILS_ENABLED', 'True').lower() == 'true'
 GUARDRAILS_LOG_LEVEL = os.getenv('GUARDRAILS_LOG_LEVEL', 'INFO')
 
+# Which AuditLog entries are recorded: all, writes_only (no searches/views/AI reads),
+# mutations_only (also no usage counters) or failures_only
+AUDIT_TRAIL_LEVEL = os.getenv('AUDIT_TRAIL_LEVEL', 'all')
+
 # Create guardrails directory if it doesn't exist
 os.makedirs(GUARDRAILS_CONFIG_PATH, exist_ok=True)
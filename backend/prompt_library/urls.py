@@ -16,36 +16,43 @@ Including another URLconf
 """
 from django.contrib import admin
 from django.urls import path, include
-from django.http import JsonResponse
+from django.http import HttpResponse
+from django.views.decorators.cache import cache_page
 from rest_framework_simplejwt.views import TokenRefreshView
 from rest_framework.routers import DefaultRouter
 from users.views import UserViewSet
+import orjson
+
+# The API root payload is static, so it is serialized once at import time
+_API_ROOT_BYTES = orjson.dumps({
+    'message': 'Welcome to Prompt Library API',
+    'version': '1.0.0',
+    'endpoints': {
+        'admin': '/admin/',
+        'auth': {
+            'login': '/api/auth/login/',
+            'register': '/api/auth/register/',
+            'refresh': '/api/auth/refresh/',
+            'profile': '/api/auth/me/',
+        },
+        'prompts': '/api/prompts/',
+        'categories': '/api/prompts/categories/',
+        'users': '/api/users/',
+    }
+})
+
 
 def api_root(request):
     """API root endpoint"""
-    return JsonResponse({
-        'message': 'Welcome to Prompt Library API',
-        'version': '1.0.0',
-        'endpoints': {
-            'admin': '/admin/',
-            'auth': {
-                'login': '/api/auth/login/',
-                'register': '/api/auth/register/',
-                'refresh': '/api/auth/refresh/',
-                'profile': '/api/auth/me/',
-            },
-            'prompts': '/api/prompts/',
-            'categories': '/api/prompts/categories/',
-            'users': '/api/users/',
-        }
-    })
+    return HttpResponse(_API_ROOT_BYTES, content_type='application/json')
+
 
 # DRF router for users endpoints under /api/users/
 router = DefaultRouter()
 router.register(r'users', UserViewSet, basename='user')
 
 urlpatterns = [
-    path('', api_root),
+    path('', cache_page(3600)(api_root)),
     path('admin/', admin.site.urls),
     path('api/', include([
         path('auth/', include('users.urls')),
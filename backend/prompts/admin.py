@@ -19,4 +19,4 @@ class PromptAdmin(admin.ModelAdmin):
     ordering = ('-created_at',)
 
     def get_queryset(self, request):
-        return super().get_queryset(request).select_related('category', 'author')
+        return super().get_queryset(request).with_related()
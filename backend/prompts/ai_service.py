@@ -3,45 +3,277 @@ AI Service for LLM integration with Ollama
 """
 
 import os
-import requests
-import json
+import re
+import httpx
+import orjson
+import hashlib
 import asyncio
-from typing import Optional, Dict, List, Any
+from types import MappingProxyType
+from typing import Optional, Dict, List, Any, AsyncIterator
 from django.conf import settings
 from django.core.cache import cache
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Service settings, read once at import time
+OLLAMA_BASE_URL = getattr(settings, 'OLLAMA_BASE_URL', 'http://localhost:11434')
+OLLAMA_DEFAULT_MODEL = getattr(settings, 'OLLAMA_DEFAULT_MODEL', 'gpt-oss:20b')
+OLLAMA_TIMEOUT = getattr(settings, 'OLLAMA_TIMEOUT', 1200)  # 20 minutes timeout
+OLLAMA_NUM_PARALLEL = getattr(settings, 'OLLAMA_NUM_PARALLEL', 4)
+OLLAMA_KEEP_ALIVE = getattr(settings, 'OLLAMA_KEEP_ALIVE', '30m')
+OLLAMA_CACHE_TIMEOUT = getattr(settings, 'OLLAMA_CACHE_TIMEOUT', 86400)  # 24 hours
+
+# Matches one bulleted or numbered line ("- foo", "* foo", "1. foo", "2) foo") and captures its text
+SUGGESTION_BULLET_RE = re.compile(r'^[ \t]*(?:[-*•]|\d+[.)])[ \t]+(.+?)[ \t\r]*$', re.MULTILINE)
+
+# Prompt templates and system messages, built once at import time
+
+SUGGESTION_SYSTEM_MESSAGES = MappingProxyType({
+    "general": "You are a helpful AI assistant that generates creative and effective prompt suggestions for various use cases.",
+    "writing": "You are a creative writing assistant that helps generate engaging prompts for content creation.",
+    "coding": "You are a programming assistant that helps generate technical prompts for software development.",
+    "analysis": "You are a data analysis assistant that helps generate prompts for research and analysis tasks.",
+    "business": "You are a business strategy assistant that helps generate prompts for professional and business use cases."
+})
+
+SUGGESTION_PROMPT_TEMPLATE = """
+        Based on the following context, generate {num_suggestions} diverse and creative prompt suggestions:
+
+        Context: {context}
+
+        Please provide each suggestion as a complete, standalone prompt that would be useful for AI language models. Make each suggestion unique and tailored to different aspects of the context.
+        """
+
+IMPROVEMENT_INSTRUCTIONS = MappingProxyType({
+    "clarity": "Make the prompt clearer and more specific",
+    "creativity": "Make the prompt more creative and engaging",
+    "specificity": "Make the prompt more detailed and specific",
+    "conciseness": "Make the prompt more concise while retaining meaning",
+    "structure": "Improve the structure and flow of the prompt"
+})
+
+IMPROVEMENT_SYSTEM_MESSAGE = "You are an expert at crafting effective AI prompts. Help improve prompts to be clearer, more specific, and more engaging."
+
+IMPROVEMENT_PROMPT_TEMPLATE = """
+        {instruction}:
+
+        Current prompt: {current_prompt}
+
+        {context_line}
+
+        Please provide an improved version of this prompt that is more effective for AI language models.
+        """
+
+ANALYSIS_SYSTEM_MESSAGE = "You are an expert AI prompt engineer. Provide detailed, constructive feedback on prompt effectiveness."
+
+ANALYSIS_PROMPT_TEMPLATE = """
+        Analyze the following prompt for effectiveness and provide detailed feedback:
+
+        Prompt: {prompt}
+
+        Please evaluate:
+        1. Clarity: Is the prompt clear and unambiguous?
+        2. Specificity: Does it provide enough detail for good results?
+        3. Structure: Is it well-organized and logical?
+        4. Creativity: Does it encourage creative responses?
+        5. Completeness: Does it include all necessary elements?
+
+        Provide specific suggestions for improvement.
+        """
+
+
+def _running_loop() -> Optional[asyncio.AbstractEventLoop]:
+    """The event loop running in this thread, if any"""
+    try:
+        return asyncio.get_running_loop()
+    except RuntimeError:
+        return None
+
+
 class OllamaService:
     """Service for interacting with Ollama LLM"""
 
+    AVAILABILITY_CACHE_KEY = 'ollama:available'
+    AVAILABILITY_PROBE_TIMEOUT = 2.0  # seconds
+    CLOSE_TIMEOUT = 5.0  # seconds
+    MODELS_CACHE_KEY = 'ollama:models'
+    JSON_HEADERS = {'Content-Type': 'application/json'}
+
     def __init__(self):
-        self.base_url = getattr(settings, 'OLLAMA_BASE_URL', 'http://localhost:11434')
-        self.default_model = getattr(settings, 'OLLAMA_DEFAULT_MODEL', 'gpt-oss:20b')
-        self.timeout = getattr(settings, 'OLLAMA_TIMEOUT', 1200)  # 20 minutes timeout
+        self.base_url = OLLAMA_BASE_URL
+        self.default_model = OLLAMA_DEFAULT_MODEL
+        self.timeout = OLLAMA_TIMEOUT
+        self.num_parallel = OLLAMA_NUM_PARALLEL
+        self.keep_alive = OLLAMA_KEEP_ALIVE
+        self.cache_timeout = OLLAMA_CACHE_TIMEOUT
+        self.availability_cache_timeout = 10  # seconds
+
+        # Pooled async client and generation semaphore, created lazily and
+        # bound to the event loop they were created on
+        self._client = None
+        self._semaphore = None
+        self._client_loop = None
+
+    def _bind_loop(self):
+        """(Re)create loop-bound resources if the running event loop changed"""
+        loop = asyncio.get_running_loop()
+        if self._client is None or self._client_loop is not loop:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                # Fail fast when Ollama is unreachable, but allow long generations
+                timeout=httpx.Timeout(self.timeout, connect=10.0),
+                limits=httpx.Limits(
+                    max_connections=32,
+                    max_keepalive_connections=16,
+                    keepalive_expiry=30.0
+                )
+            )
+            self._semaphore = asyncio.Semaphore(self.num_parallel)
+            self._client_loop = loop
+
+    def _get_client(self) -> httpx.AsyncClient:
+        """Get the shared keep-alive client for the running event loop"""
+        self._bind_loop()
+        return self._client
+
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        """Get the semaphore capping concurrent generations on the running event loop"""
+        self._bind_loop()
+        return self._semaphore
+
+    def close(self):
+        """Close the pooled client and release its connections"""
+        client, loop = self._client, self._client_loop
+        self._client = None
+        self._semaphore = None
+        self._client_loop = None
+
+        if client is None or loop is None or loop.is_closed():
+            return
+
+        try:
+            if not loop.is_running():
+                loop.run_until_complete(client.aclose())
+            elif _running_loop() is loop:
+                # Called from a coroutine on that loop; it can't block on itself
+                loop.create_task(client.aclose())
+            else:
+                # The shared background loop runs forever in its own thread
+                asyncio.run_coroutine_threadsafe(client.aclose(), loop).result(self.CLOSE_TIMEOUT)
+        except Exception as e:
+            logger.warning(f"Error closing Ollama client: {e}")
 
     def is_ollama_available(self) -> bool:
-        """Check if Ollama service is available"""
+        """Check if Ollama service is available (cached for a few seconds)"""
+        return cache.get_or_set(
+            self.AVAILABILITY_CACHE_KEY,
+            self._probe_availability,
+            self.availability_cache_timeout
+        )
+
+    def _probe_availability(self) -> bool:
         try:
-            response = requests.get(f"{self.base_url}/api/tags", timeout=5)
+            response = httpx.get(f"{self.base_url}/api/tags", timeout=self.AVAILABILITY_PROBE_TIMEOUT)
             return response.status_code == 200
-        except requests.RequestException as e:
+        except httpx.HTTPError as e:
             logger.warning(f"Ollama service not available: {e}")
             return False
 
+    async def is_ollama_available_async(self) -> bool:
+        """Check if Ollama service is available without blocking the event loop (cached for a few seconds)"""
+        available = await cache.aget(self.AVAILABILITY_CACHE_KEY)
+        if available is not None:
+            return available
+
+        try:
+            response = await self._get_client().get("/api/tags", timeout=self.AVAILABILITY_PROBE_TIMEOUT)
+            available = response.status_code == 200
+        except httpx.HTTPError as e:
+            logger.warning(f"Ollama service not available: {e}")
+            available = False
+
+        await cache.aset(self.AVAILABILITY_CACHE_KEY, available, self.availability_cache_timeout)
+        return available
+
+    def preload_model(self, model: Optional[str] = None) -> bool:
+        """Load a model into Ollama's memory ahead of the first real request"""
+        model = model or self.default_model
+        payload = {"model": model, "keep_alive": self.keep_alive, "stream": False}
+
+        try:
+            # A generate request without a prompt only loads the model
+            response = httpx.post(
+                f"{self.base_url}/api/generate",
+                content=orjson.dumps(payload),
+                headers=self.JSON_HEADERS,
+                timeout=self.timeout
+            )
+            return response.status_code == 200
+        except httpx.HTTPError as e:
+            logger.warning(f"Failed to preload Ollama model {model}: {e}")
+            return False
+
     def get_available_models(self) -> List[Dict[str, Any]]:
-        """Get list of available models from Ollama"""
+        """Get list of available models from Ollama (cached for a few seconds)"""
+        models = cache.get(self.MODELS_CACHE_KEY)
+        if models is None:
+            models = self._fetch_models()
+            cache.set(self.MODELS_CACHE_KEY, models, self.availability_cache_timeout)
+        return models
+
+    def _fetch_models(self) -> List[Dict[str, Any]]:
         try:
-            response = requests.get(f"{self.base_url}/api/tags", timeout=self.timeout)
+            response = httpx.get(f"{self.base_url}/api/tags", timeout=self.timeout)
             if response.status_code == 200:
-                data = response.json()
+                data = orjson.loads(response.content)
                 return data.get('models', [])
             return []
-        except requests.RequestException as e:
+        except httpx.HTTPError as e:
             logger.error(f"Error fetching models from Ollama: {e}")
             return []
 
+    @staticmethod
+    def _cache_key(namespace: str, *parts: Any) -> str:
+        """Build a cache key from the inputs of an LLM call"""
+        digest = hashlib.blake2b(digest_size=16)
+        for part in parts:
+            digest.update(str(part).encode('utf-8'))
+            digest.update(b'\x00')
+        return f"ollama:{namespace}:{digest.hexdigest()}"
+
+    @staticmethod
+    def _normalize(text: Optional[str]) -> str:
+        """Lowercase and collapse whitespace so equivalent inputs share a cache entry"""
+        return ' '.join((text or '').lower().split())
+
+    def _build_payload(
+        self,
+        prompt: str,
+        model: Optional[str],
+        system_message: Optional[str],
+        max_tokens: int,
+        temperature: float,
+        stream: bool
+    ) -> Dict[str, Any]:
+        """Build the /api/generate request body"""
+        payload = {
+            "model": model or self.default_model,
+            "prompt": prompt,
+            "stream": stream,
+            "keep_alive": self.keep_alive,
+            # Ollama only honours sampling/length settings inside "options"
+            "options": {
+                "num_predict": max_tokens,
+                "temperature": temperature
+            }
+        }
+
+        if system_message:
+            payload["system"] = system_message
+
+        return payload
+
     async def generate_completion(
         self,
         prompt: str,
@@ -51,40 +283,71 @@ class OllamaService:
         temperature: float = 0.7
     ) -> Dict[str, Any]:
         """Generate text completion using Ollama"""
-        model = model or self.default_model
+        payload = self._build_payload(prompt, model, system_message, max_tokens, temperature, stream=False)
 
-        payload = {
-            "model": model,
-            "prompt": prompt,
-            "max_tokens": max_tokens,
-            "temperature": temperature,
-            "stream": False
-        }
-
-        if system_message:
-            payload["system"] = system_message
+        cache_key = self._cache_key(
+            'completion', payload['model'], system_message, prompt, max_tokens, temperature
+        )
+        cached = await cache.aget(cache_key)
+        if cached is not None:
+            return cached
 
         try:
-            response = requests.post(
-                f"{self.base_url}/api/generate",
-                json=payload,
-                timeout=self.timeout
-            )
+            async with self._get_semaphore():
+                response = await self._get_client().post(
+                    "/api/generate", content=orjson.dumps(payload), headers=self.JSON_HEADERS
+                )
 
             if response.status_code == 200:
-                return response.json()
+                result = orjson.loads(response.content)
+                await cache.aset(cache_key, result, self.cache_timeout)
+                return result
             else:
                 return {
                     "error": f"HTTP {response.status_code}",
                     "response": "Failed to generate completion"
                 }
-        except requests.RequestException as e:
+        except httpx.HTTPError as e:
             logger.error(f"Error generating completion: {e}")
             return {
                 "error": str(e),
                 "response": "Service unavailable"
             }
 
+    async def stream_completion(
+        self,
+        prompt: str,
+        model: Optional[str] = None,
+        system_message: Optional[str] = None,
+        max_tokens: int = 500,
+        temperature: float = 0.7
+    ) -> AsyncIterator[str]:
+        """Stream completion text from Ollama as it is generated
+
+        Closing the generator early closes the HTTP response, which stops the
+        generation on the Ollama side. Raises httpx.HTTPError on failures.
+        """
+        payload = self._build_payload(prompt, model, system_message, max_tokens, temperature, stream=True)
+
+        async with self._get_semaphore():
+            async with self._get_client().stream(
+                "POST", "/api/generate", content=orjson.dumps(payload), headers=self.JSON_HEADERS
+            ) as response:
+                response.raise_for_status()
+
+                async for line in response.aiter_lines():
+                    if not line:
+                        continue
+
+                    chunk = orjson.loads(line)
+                    if "error" in chunk:
+                        raise RuntimeError(chunk["error"])
+
+                    yield chunk.get("response", "")
+
+                    if chunk.get("done"):
+                        break
+
     async def generate_prompt_suggestions(
         self,
         context: str,
@@ -92,54 +355,60 @@ class OllamaService:
         num_suggestions: int = 3
     ) -> List[str]:
         """Generate prompt suggestions based on context"""
-        if not self.is_ollama_available():
+        cache_key = self._cache_key(
+            'suggestions', self._normalize(context), suggestion_type, num_suggestions
+        )
+        cached = await cache.aget(cache_key)
+        if cached is not None:
+            return cached
+
+        if not await self.is_ollama_available_async():
             return ["Ollama service is not available. Please ensure Ollama is running locally."]
 
-        system_messages = {
-            "general": "You are a helpful AI assistant that generates creative and effective prompt suggestions for various use cases.",
-            "writing": "You are a creative writing assistant that helps generate engaging prompts for content creation.",
-            "coding": "You are a programming assistant that helps generate technical prompts for software development.",
-            "analysis": "You are a data analysis assistant that helps generate prompts for research and analysis tasks.",
-            "business": "You are a business strategy assistant that helps generate prompts for professional and business use cases."
-        }
-
-        system_message = system_messages.get(suggestion_type, system_messages["general"])
+        system_message = SUGGESTION_SYSTEM_MESSAGES.get(suggestion_type, SUGGESTION_SYSTEM_MESSAGES["general"])
 
-        prompt = f"""
-        Based on the following context, generate {num_suggestions} diverse and creative prompt suggestions:
-
-        Context: {context}
-
-        Please provide each suggestion as a complete, standalone prompt that would be useful for AI language models. Make each suggestion unique and tailored to different aspects of the context.
-        """
+        prompt = SUGGESTION_PROMPT_TEMPLATE.format(num_suggestions=num_suggestions, context=context)
 
         try:
-            result = await self.generate_completion(
+            suggestions = []
+            buffer = ""
+            stream = self.stream_completion(
                 prompt=prompt,
                 system_message=system_message,
                 max_tokens=800,
                 temperature=0.8
             )
 
-            if "error" in result:
-                return [f"Error generating suggestions: {result['error']}"]
-
-            response_text = result.get("response", "")
-
-            # Parse the response to extract individual suggestions
-            suggestions = []
-            lines = response_text.strip().split('\n')
-
-            for line in lines:
-                line = line.strip()
-                if line and (line.startswith('-') or line.startswith('*') or line.isdigit()):
-                    # Remove bullet points and numbering
-                    suggestion = line.lstrip('-*123456789. ').strip()
-                    if suggestion:
-                        suggestions.append(suggestion)
-
-            return suggestions[:num_suggestions]
-
+            # Parse suggestions line by line as they arrive and stop as soon as we have enough
+            try:
+                async for fragment in stream:
+                    buffer += fragment
+                    newline = buffer.rfind('\n')
+                    if newline == -1:
+                        continue
+
+                    complete, buffer = buffer[:newline], buffer[newline + 1:]
+                    suggestions.extend(m.group(1) for m in SUGGESTION_BULLET_RE.finditer(complete))
+
+                    if len(suggestions) >= num_suggestions:
+                        break
+            finally:
+                await stream.aclose()
+
+            if len(suggestions) < num_suggestions:
+                suggestions.extend(m.group(1) for m in SUGGESTION_BULLET_RE.finditer(buffer))
+
+            suggestions = suggestions[:num_suggestions]
+            # A reply with no bullet lines isn't worth pinning for the whole cache timeout
+            if suggestions:
+                await cache.aset(cache_key, suggestions, self.cache_timeout)
+            return suggestions
+
+        except httpx.HTTPStatusError as e:
+            return [f"Error generating suggestions: HTTP {e.response.status_code}"]
+        except httpx.HTTPError as e:
+            logger.error(f"Error generating completion: {e}")
+            return [f"Error generating suggestions: {str(e)}"]
         except Exception as e:
             logger.error(f"Error in generate_prompt_suggestions: {e}")
             return [f"Unexpected error: {str(e)}"]
@@ -151,36 +420,31 @@ class OllamaService:
         context: Optional[str] = None
     ) -> Dict[str, Any]:
         """Improve an existing prompt based on specific criteria"""
-        if not self.is_ollama_available():
+        cache_key = self._cache_key(
+            'improve', self._normalize(current_prompt), improvement_type, self._normalize(context)
+        )
+        cached = await cache.aget(cache_key)
+        if cached is not None:
+            return cached
+
+        if not await self.is_ollama_available_async():
             return {
                 "error": "Ollama service is not available",
                 "improved_prompt": current_prompt
             }
 
-        improvement_instructions = {
-            "clarity": "Make the prompt clearer and more specific",
-            "creativity": "Make the prompt more creative and engaging",
-            "specificity": "Make the prompt more detailed and specific",
-            "conciseness": "Make the prompt more concise while retaining meaning",
-            "structure": "Improve the structure and flow of the prompt"
-        }
-
-        instruction = improvement_instructions.get(improvement_type, improvement_instructions["clarity"])
+        instruction = IMPROVEMENT_INSTRUCTIONS.get(improvement_type, IMPROVEMENT_INSTRUCTIONS["clarity"])
 
-        prompt = f"""
-        {instruction}:
-
-        Current prompt: {current_prompt}
-
-        {f'Additional context: {context}' if context else ''}
-
-        Please provide an improved version of this prompt that is more effective for AI language models.
-        """
+        prompt = IMPROVEMENT_PROMPT_TEMPLATE.format(
+            instruction=instruction,
+            current_prompt=current_prompt,
+            context_line=f'Additional context: {context}' if context else ''
+        )
 
         try:
             result = await self.generate_completion(
                 prompt=prompt,
-                system_message="You are an expert at crafting effective AI prompts. Help improve prompts to be clearer, more specific, and more engaging.",
+                system_message=IMPROVEMENT_SYSTEM_MESSAGE,
                 max_tokens=600,
                 temperature=0.7
             )
@@ -193,11 +457,13 @@ class OllamaService:
 
             improved_prompt = result.get("response", current_prompt).strip()
 
-            return {
+            improvement = {
                 "original_prompt": current_prompt,
                 "improved_prompt": improved_prompt,
                 "improvement_type": improvement_type
             }
+            await cache.aset(cache_key, improvement, self.cache_timeout)
+            return improvement
 
         except Exception as e:
             logger.error(f"Error in improve_prompt: {e}")
@@ -211,31 +477,23 @@ class OllamaService:
         prompt: str
     ) -> Dict[str, Any]:
         """Analyze a prompt for effectiveness and provide suggestions"""
-        if not self.is_ollama_available():
+        cache_key = self._cache_key('analysis', self._normalize(prompt))
+        cached = await cache.aget(cache_key)
+        if cached is not None:
+            return cached
+
+        if not await self.is_ollama_available_async():
             return {
                 "error": "Ollama service is not available",
                 "analysis": "Service unavailable"
             }
 
-        analysis_prompt = f"""
-        Analyze the following prompt for effectiveness and provide detailed feedback:
-
-        Prompt: {prompt}
-
-        Please evaluate:
-        1. Clarity: Is the prompt clear and unambiguous?
-        2. Specificity: Does it provide enough detail for good results?
-        3. Structure: Is it well-organized and logical?
-        4. Creativity: Does it encourage creative responses?
-        5. Completeness: Does it include all necessary elements?
-
-        Provide specific suggestions for improvement.
-        """
+        analysis_prompt = ANALYSIS_PROMPT_TEMPLATE.format(prompt=prompt)
 
         try:
             result = await self.generate_completion(
                 prompt=analysis_prompt,
-                system_message="You are an expert AI prompt engineer. Provide detailed, constructive feedback on prompt effectiveness.",
+                system_message=ANALYSIS_SYSTEM_MESSAGE,
                 max_tokens=1000,
                 temperature=0.6
             )
@@ -246,11 +504,13 @@ class OllamaService:
                     "analysis": "Analysis unavailable"
                 }
 
-            return {
+            analysis = {
                 "prompt": prompt,
                 "analysis": result.get("response", "").strip(),
                 "timestamp": "2024-01-01T00:00:00Z"  # In real implementation, use actual timestamp
             }
+            await cache.aset(cache_key, analysis, self.cache_timeout)
+            return analysis
 
         except Exception as e:
             logger.error(f"Error in analyze_prompt_effectiveness: {e}")
@@ -259,5 +519,33 @@ class OllamaService:
                 "analysis": "Analysis unavailable"
             }
 
-# Global service instance
-ollama_service = OllamaService()
+
+# Per-process service instances, keyed by pid so forked workers never share pooled connections
+_services: Dict[int, OllamaService] = {}
+
+
+def get_ollama_service() -> OllamaService:
+    """Get the OllamaService for the current process, creating it on first use"""
+    pid = os.getpid()
+    service = _services.get(pid)
+    if service is None:
+        service = _services.setdefault(pid, OllamaService())
+    return service
+
+
+def close_ollama_service():
+    """Close the current process' service, if one was created"""
+    service = _services.pop(os.getpid(), None)
+    if service is not None:
+        service.close()
+
+
+# Forked children (e.g. gunicorn workers) drop the parent's instance and build their own lazily
+os.register_at_fork(after_in_child=_services.clear)
+
+
+def __getattr__(name):
+    # Keep `from prompts.ai_service import ollama_service` working
+    if name == 'ollama_service':
+        return get_ollama_service()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
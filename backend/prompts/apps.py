@@ -1,6 +1,38 @@
+import atexit
+import os
+import sys
+import threading
+
 from django.apps import AppConfig
+from django.conf import settings
+
+
+def _is_server_process():
+    """True in a process that serves requests: a gunicorn/uvicorn worker or runserver's reloaded child"""
+    program = os.path.basename(sys.argv[0])
+    if program.startswith(('gunicorn', 'uvicorn')):
+        return True
+    return sys.argv[1:2] == ['runserver'] and os.environ.get('RUN_MAIN') == 'true'
 
 
 class PromptsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'prompts'
+
+    def ready(self):
+        from . import signals  # noqa: F401
+        from .ai_service import close_ollama_service, get_ollama_service
+        from .writers import stop_writers
+
+        # Release pooled Ollama connections when the process shuts down
+        atexit.register(close_ollama_service)
+        # Write out audit entries still queued in the background writers
+        atexit.register(stop_writers)
+
+        # Warm up the default model in the background so the first request doesn't pay the load time
+        if getattr(settings, 'OLLAMA_PRELOAD_MODEL', False) and _is_server_process():
+            threading.Thread(
+                target=lambda: get_ollama_service().preload_model(),
+                name='ollama-preload',
+                daemon=True
+            ).start()
@@ -0,0 +1,49 @@
+"""
+Text embeddings used by semantic search
+"""
+
+import hashlib
+
+import numpy as np
+
+# Stored vectors are raw float32 bytes
+EMBEDDING_DTYPE = np.float32
+EMBEDDING_DIM = 50
+
+# Identifies the scheme that produced a stored vector; bump it whenever text_embedding changes
+EMBEDDING_MODEL = f'blake2b-{EMBEDDING_DIM}'
+
+# Cache generation for search's stacked embedding matrices; replaced whenever a prompt changes
+EMBEDDING_MATRIX_GENERATION_KEY = 'search:embeddings:generation'
+
+# Fields that feed a prompt's embedding; saves that touch none of them keep the stored vector
+EMBEDDED_FIELDS = frozenset(['title', 'description', 'content'])
+
+
+def embedding_text(title: str, description: str, content: str) -> str:
+    """The text a prompt with these fields is embedded from"""
+    return f"{title} {description or ''} {content[:1000]}"
+
+
+def prompt_text(prompt) -> str:
+    """The text a prompt is embedded from"""
+    return embedding_text(prompt.title, prompt.description, prompt.content)
+
+
+def text_embedding(text: str) -> np.ndarray:
+    """Get the embedding vector for text"""
+    # For demo purposes, create a simple hash-based embedding
+    # In production, this would use a real embedding model
+    digest = hashlib.blake2b(text.encode('utf-8'), digest_size=EMBEDDING_DIM).digest()
+    return np.frombuffer(digest, dtype=np.uint8).astype(EMBEDDING_DTYPE) / 255.0
+
+
+def prompt_embedding_bytes(prompt) -> bytes:
+    """Serialized embedding for a prompt, as stored in PromptEmbedding.vector"""
+    return text_embedding(prompt_text(prompt)).tobytes()
+
+
+def stack_embeddings(vectors) -> np.ndarray:
+    """Stack stored vectors into an (N, D) matrix in one copy"""
+    vectors = list(vectors)
+    return np.frombuffer(b''.join(vectors), dtype=EMBEDDING_DTYPE).reshape(len(vectors), -1)
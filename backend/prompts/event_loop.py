@@ -0,0 +1,34 @@
+"""
+A shared background event loop for running coroutines from synchronous views
+"""
+
+import asyncio
+import os
+import threading
+
+_lock = threading.Lock()
+_loop = None
+_pid = None
+
+
+def _get_loop() -> asyncio.AbstractEventLoop:
+    global _loop, _pid
+    pid = os.getpid()
+    if _loop is not None and _pid == pid:
+        return _loop
+    with _lock:
+        if _loop is None or _pid != pid:
+            # Threads don't survive fork, so each worker process starts its own loop
+            loop = asyncio.new_event_loop()
+            threading.Thread(target=loop.run_forever, name='prompts-event-loop', daemon=True).start()
+            _loop, _pid = loop, pid
+    return _loop
+
+
+def run_sync(coro, timeout=None):
+    """Run coro on the shared loop and block until it finishes.
+
+    The loop lives for the whole process, so loop-bound resources such as
+    OllamaService's pooled httpx client are reused across requests.
+    """
+    return asyncio.run_coroutine_threadsafe(coro, _get_loop()).result(timeout)
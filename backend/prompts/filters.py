@@ -4,9 +4,9 @@ from .models import Prompt, Category
 
 
 class PromptFilter(FilterSet):
-    """Custom filter for Prompt model to handle JSONField tags"""
+    """Custom filter for Prompt model to handle ArrayField tags"""
 
-    # Custom filter for tags field (JSONField)
+    # Custom filter for tags field (ArrayField)
     tags = django_filters.CharFilter(method='filter_tags')
 
     class Meta:
@@ -24,6 +24,6 @@ class PromptFilter(FilterSet):
         }
 
     def filter_tags(self, queryset, name, value):
-        """Custom filter for tags JSONField"""
-        # Filter prompts where tags array contains the specified value
-        return queryset.filter(tags__icontains=value)
+        """Custom filter for tags ArrayField"""
+        # Substring match on any tag, so ?tags=mail finds "email"
+        return queryset.with_tags_text().filter(tags_text__icontains=value)
@@ -8,6 +8,8 @@ import yaml
 import json
 import asyncio
 import logging
+from bisect import bisect_right
+from functools import lru_cache
 from typing import Dict, List, Optional, Any, Tuple
 from datetime import datetime
 from django.conf import settings
@@ -17,10 +19,176 @@ import re
 
 logger = logging.getLogger(__name__)
 
+# Use the libyaml-backed loader when PyYAML was built with it
+YAML_LOADER = getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
+
+# Keyword scans run on RE2's linear-time engine when google-re2 is installed
+try:
+    import re2 as keyword_re
+except ImportError:
+    keyword_re = re
+
+# Keyword lists per violation category, in the order violations are reported
+
+INPUT_VIOLATION_PATTERNS = {
+    # Jailbreak attempts
+    "jailbreak_attempt": [
+        "ignore previous", "override", "bypass", "system prompt",
+        "developer mode", "admin mode", "uncensored", "jailbreak",
+        "ignore instructions", "new instructions", "disregard",
+        "unlimited", "no restrictions", "no limits"
+    ],
+    # Harmful content
+    "harmful_content": [
+        "harm", "kill", "attack", "exploit", "hack", "steal",
+        "illegal", "drugs", "weapon", "violence", "murder",
+        "assault", "abuse", "torture", "terrorism", "bomb",
+        "poison", "suicide", "self-harm"
+    ],
+    # Personal information requests
+    "personal_information": [
+        "social security", "credit card", "password", "ssn",
+        "birth date", "address", "phone number", "email address",
+        "bank account", "medical records", "driver license",
+        "passport number", "identification number"
+    ],
+    # Deceptive content
+    "deceptive_content": [
+        "fake", "forge", "impersonate", "pretend", "lie",
+        "mislead", "deceive", "fraud", "scam", "phishing",
+        "fake news", "misinformation", "disinformation"
+    ],
+    # Illegal activities
+    "illegal_activity": [
+        "how to hack", "how to steal", "how to make drugs",
+        "how to weapon", "illegal", "unlawful", "criminal",
+        "black market", "dark web", "money laundering",
+        "tax evasion", "fraudulent", "counterfeit"
+    ],
+}
+
+OUTPUT_VIOLATION_PATTERNS = {
+    # Inappropriate content
+    "inappropriate_content": [
+        "inappropriate", "offensive", "hate", "discriminatory",
+        "harassment", "threat", "abuse", "insult", "bully",
+        "racist", "sexist", "homophobic", "transphobic",
+        "offensive language", "curse words", "profanity"
+    ],
+    # Misinformation
+    "misinformation": [
+        "false", "incorrect", "wrong", "lie", "misleading",
+        "untrue", "fabricated", "made up", "fake information"
+    ],
+    # Unsafe instructions
+    "unsafe_instructions": [
+        "how to hack", "how to steal", "how to make drugs",
+        "how to weapon", "illegal", "dangerous", "harmful",
+        "how to hurt", "how to damage", "how to break"
+    ],
+    # Privacy violations
+    "privacy_violation": [
+        "personal information", "private data", "confidential",
+        "sensitive information", "private details", "personal data"
+    ],
+}
+
+# Canned refusal sentence per input violation category; the LLM is only asked to explain on request
+REFUSAL_TEMPLATES = {
+    "jailbreak_attempt": "It appears to try to override the assistant's safety instructions.",
+    "harmful_content": "It involves content that could cause harm.",
+    "personal_information": "It asks for sensitive personal information.",
+    "deceptive_content": "It asks for deceptive or misleading content.",
+    "illegal_activity": "It relates to illegal activity.",
+}
+DEFAULT_REFUSAL = "I'm sorry, but I can't help with this request due to safety concerns."
+
+
+def _fuse(keywords, engine=None) -> re.Pattern:
+    # Keywords must start a word, so "skills" doesn't hit "kill" but "killing" still does.
+    # RE2's \b only knows ASCII word characters, so re is pinned to ASCII too; verdicts then
+    # don't depend on whether google-re2 is installed
+    engine = engine or keyword_re
+    pattern = r'\b(?:' + '|'.join(map(engine.escape, keywords)) + ')'
+    if engine is re:
+        return re.compile(pattern, re.ASCII)
+    return engine.compile(pattern)
+
+
+def _compile_patterns(patterns: Dict[str, List[str]]) -> Dict[str, re.Pattern]:
+    """Fuse each category's keywords into a single alternation, matched against lowercased text"""
+    return {category: _fuse(keywords) for category, keywords in patterns.items()}
+
+
+def _compile_prefilter(patterns: Dict[str, List[str]]) -> re.Pattern:
+    """Fuse every keyword of every category into one alternation used to reject clean text in a single pass"""
+    return _fuse(sorted({keyword for keywords in patterns.values() for keyword in keywords}))
+
+
+INPUT_VIOLATION_REGEXES = _compile_patterns(INPUT_VIOLATION_PATTERNS)
+OUTPUT_VIOLATION_REGEXES = _compile_patterns(OUTPUT_VIOLATION_PATTERNS)
+INPUT_VIOLATION_PREFILTER = _compile_prefilter(INPUT_VIOLATION_PATTERNS)
+OUTPUT_VIOLATION_PREFILTER = _compile_prefilter(OUTPUT_VIOLATION_PATTERNS)
+
+# Longer inputs are scanned without caching to bound the memory held by the cache
+MAX_CACHED_TEXT_LENGTH = 8192
+
+
+def _scan(prefilter: re.Pattern, regexes: Dict[str, re.Pattern], text: str) -> List[str]:
+    """Return the categories whose regex matches text, in reporting order"""
+    # Lowercase once up front; case-sensitive scans of the result are far cheaper than IGNORECASE ones
+    lowered = text.lower()
+    # Most text is clean: one pass over it settles that without running every category
+    if not prefilter.search(lowered):
+        return []
+    return [category for category, regex in regexes.items() if regex.search(lowered)]
+
+
+def _scan_messages(prefilter: re.Pattern, regexes: Dict[str, re.Pattern], texts: List[str]) -> List[List[str]]:
+    """_scan each of texts, in one pass per category over the texts joined with a sentinel"""
+    lowered = [text.lower() for text in texts]
+    # No keyword contains NUL, so no match can straddle two messages
+    joined = '\x00'.join(lowered)
+    if not prefilter.search(joined):
+        return [[] for _ in texts]
+
+    starts = []
+    offset = 0
+    for text in lowered:
+        starts.append(offset)
+        offset += len(text) + 1
+
+    found = [set() for _ in texts]
+    for category, regex in regexes.items():
+        pos = 0
+        while (match := regex.search(joined, pos)) is not None:
+            index = bisect_right(starts, match.start()) - 1
+            found[index].add(category)
+            # One hit per message is enough; resume at the next message
+            if index + 1 == len(starts):
+                break
+            pos = starts[index + 1]
+
+    return [[category for category in regexes if category in hits] for hits in found]
+
+
+async def _in_thread(func, *args):
+    """Run a CPU-bound helper in the default executor so the event loop keeps serving other requests"""
+    return await asyncio.get_running_loop().run_in_executor(None, func, *args)
+
+
+@lru_cache(maxsize=1024)
+def _scan_input_cached(text: str) -> Tuple[str, ...]:
+    return tuple(_scan(INPUT_VIOLATION_PREFILTER, INPUT_VIOLATION_REGEXES, text))
+
 
 class NemoGuardrailsService:
     """Custom service for managing AI safety and compliance checks"""
 
+    CONFIG_FILENAME = 'config.json'
+    # Read when no config.json exists yet; superseded by the first update
+    LEGACY_CONFIG_FILENAME = 'config.yml'
+
     def __init__(self):
         self.config_path = getattr(
             settings,
@@ -32,8 +200,11 @@ class NemoGuardrailsService:
         self.config_cache_timeout = 300  # 5 minutes
         self.use_custom_validation = True  # Enable custom validation
 
-        # Ensure config directory exists
-        os.makedirs(self.config_path, exist_ok=True)
+        # Parsed config, reused until the file or its mtime changes
+        self._config_cache = None
+        self._config_key = None
+        # Whether a config file is on disk; only we create it, so once True it stays True
+        self._has_config = None
 
         # Initialize the service
         self._initialize_service()
@@ -92,11 +263,9 @@ assistant "I'm sorry, but I can't help with requests that attempt to bypass safe
         """Initialize the custom guardrails service"""
         try:
             # Create default config file if it doesn't exist
-            config_file = os.path.join(self.config_path, 'config.yml')
-
-            if not os.path.exists(config_file):
-                with open(config_file, 'w') as f:
-                    yaml.dump(self.default_config, f, default_flow_style=False)
+            if not self._config_exists():
+                self._write_config(self.default_config)
+            self._has_config = True
 
             logger.info("Custom Guardrails service initialized successfully")
 
@@ -104,6 +273,25 @@ assistant "I'm sorry, but I can't help with requests that attempt to bypass safe
             logger.error(f"Failed to initialize Custom Guardrails service: {e}")
             self.use_custom_validation = True  # Fall back to custom validation
 
+    def _config_exists(self) -> bool:
+        return any(
+            os.path.exists(os.path.join(self.config_path, filename))
+            for filename in (self.CONFIG_FILENAME, self.LEGACY_CONFIG_FILENAME)
+        )
+
+    def _write_config(self, config: Dict[str, Any]):
+        """Write config as JSON via a temp file so readers never see a partial file"""
+        config_file = os.path.join(self.config_path, self.CONFIG_FILENAME)
+        tmp_file = f"{config_file}.tmp"
+
+        os.makedirs(self.config_path, exist_ok=True)
+        with open(tmp_file, 'w') as f:
+            json.dump(config, f, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_file, config_file)
+        self._has_config = True
+
     def is_guardrails_available(self) -> bool:
         """Check if guardrails service is available"""
         return True  # Custom service is always available
@@ -130,19 +318,22 @@ assistant "I'm sorry, but I can't help with requests that attempt to bypass safe
 
     async def _custom_input_validation(self, text: str, context: Optional[Dict] = None) -> Dict[str, Any]:
         """Custom input validation using AI model"""
-        violations = self._detect_violations(text)
-        risk_level = self._assess_risk_level(text, None)
+        violations = await _in_thread(self._detect_violations, text)
+        risk_level = self._assess_risk_level(violations)
 
         if violations:
-            # Generate a response explaining the refusal
-            response_text = await self._generate_safety_response(text, violations)
+            if context and context.get("explain"):
+                # Only an explicit request for an explanation pays for an LLM round trip
+                response_text = await self._generate_safety_response(text, violations)
+            else:
+                response_text = self._template_safety_response(violations)
 
             return {
                 "valid": False,
                 "message": response_text,
                 "risk_level": risk_level,
                 "violations": violations,
-                "suggestions": self._get_safety_suggestions(text)
+                "suggestions": self._get_safety_suggestions(violations)
             }
 
         return {
@@ -156,20 +347,25 @@ assistant "I'm sorry, but I can't help with requests that attempt to bypass safe
     def _basic_input_validation(self, text: str) -> Dict[str, Any]:
         """Basic rule-based input validation"""
         violations = self._detect_violations(text)
-        risk_level = self._assess_risk_level(text, None)
+        risk_level = self._assess_risk_level(violations)
 
         return {
             "valid": len(violations) == 0,
             "message": "Basic validation completed",
             "risk_level": risk_level,
             "violations": violations,
-            "suggestions": self._get_safety_suggestions(text)
+            "suggestions": self._get_safety_suggestions(violations)
         }
 
+    def _template_safety_response(self, violations: List[str]) -> str:
+        """Build a refusal from the canned sentence for each violation"""
+        reasons = [REFUSAL_TEMPLATES[v] for v in violations if v in REFUSAL_TEMPLATES]
+        return " ".join([DEFAULT_REFUSAL, *reasons])
+
     async def _generate_safety_response(self, text: str, violations: List[str]) -> str:
         """Generate a safety response using the AI model"""
         try:
-            from prompts.ai_service import ollama_service
+            from prompts.ai_service import get_ollama_service
 
             # Create a prompt for generating safety responses
             prompt = f"""
@@ -181,7 +377,8 @@ assistant "I'm sorry, but I can't help with requests that attempt to bypass safe
             focusing on the safety concerns. Keep the response under 100 words.
             """
 
-            result = await ollama_service.generate_completion(
+            # Goes through the process-wide service and its keep-alive connection pool
+            result = await get_ollama_service().generate_completion(
                 prompt=prompt,
                 system_message="You are a safety assistant. Provide short, clear explanations for why requests are declined.",
                 max_tokens=200,
@@ -189,19 +386,19 @@ assistant "I'm sorry, but I can't help with requests that attempt to bypass safe
             )
 
             if "error" not in result:
-                return result.get("response", "I'm sorry, but I can't help with this request due to safety concerns.").strip()
+                return result.get("response", DEFAULT_REFUSAL).strip()
             else:
-                return "I'm sorry, but I can't help with this request due to safety concerns."
+                return DEFAULT_REFUSAL
 
         except Exception as e:
             logger.error(f"Error generating safety response: {e}")
-            return "I'm sorry, but I can't help with this request due to safety concerns."
+            return DEFAULT_REFUSAL
 
     async def validate_output(self, input_text: str, output_text: str) -> Dict[str, Any]:
         """Validate output text using custom safety checks"""
         try:
             # Check for output violations
-            violations = self._detect_output_violations(output_text)
+            violations = await _in_thread(self._detect_output_violations, output_text)
             risk_level = self._assess_output_risk(violations)
 
             return {
@@ -224,113 +421,17 @@ assistant "I'm sorry, but I can't help with requests that attempt to bypass safe
 
     def _detect_violations(self, text: str) -> List[str]:
         """Detect potential violations in text"""
-        violations = []
-
-        # Check for jailbreak attempts
-        jailbreak_patterns = [
-            "ignore previous", "override", "bypass", "system prompt",
-            "developer mode", "admin mode", "uncensored", "jailbreak",
-            "ignore instructions", "new instructions", "disregard",
-            "unlimited", "no restrictions", "no limits"
-        ]
-
-        if any(pattern in text.lower() for pattern in jailbreak_patterns):
-            violations.append("jailbreak_attempt")
-
-        # Check for harmful content
-        harmful_patterns = [
-            "harm", "kill", "attack", "exploit", "hack", "steal",
-            "illegal", "drugs", "weapon", "violence", "murder",
-            "assault", "abuse", "torture", "terrorism", "bomb",
-            "poison", "suicide", "self-harm"
-        ]
-
-        if any(pattern in text.lower() for pattern in harmful_patterns):
-            violations.append("harmful_content")
-
-        # Check for personal information requests
-        personal_patterns = [
-            "social security", "credit card", "password", "ssn",
-            "birth date", "address", "phone number", "email address",
-            "bank account", "medical records", "driver license",
-            "passport number", "identification number"
-        ]
-
-        if any(pattern in text.lower() for pattern in personal_patterns):
-            violations.append("personal_information")
-
-        # Check for deceptive content
-        deceptive_patterns = [
-            "fake", "forge", "impersonate", "pretend", "lie",
-            "mislead", "deceive", "fraud", "scam", "phishing",
-            "fake news", "misinformation", "disinformation"
-        ]
-
-        if any(pattern in text.lower() for pattern in deceptive_patterns):
-            violations.append("deceptive_content")
-
-        # Check for illegal activities
-        illegal_patterns = [
-            "how to hack", "how to steal", "how to make drugs",
-            "how to weapon", "illegal", "unlawful", "criminal",
-            "black market", "dark web", "money laundering",
-            "tax evasion", "fraudulent", "counterfeit"
-        ]
-
-        if any(pattern in text.lower() for pattern in illegal_patterns):
-            violations.append("illegal_activity")
-
-        return violations
+        # Prompts are often re-validated verbatim (templates, retries), so reuse earlier scans
+        if len(text) <= MAX_CACHED_TEXT_LENGTH:
+            return list(_scan_input_cached(text))
+        return _scan(INPUT_VIOLATION_PREFILTER, INPUT_VIOLATION_REGEXES, text)
 
     def _detect_output_violations(self, text: str) -> List[str]:
         """Detect violations in AI output"""
-        violations = []
-
-        # Check for inappropriate content
-        inappropriate_patterns = [
-            "inappropriate", "offensive", "hate", "discriminatory",
-            "harassment", "threat", "abuse", "insult", "bully",
-            "racist", "sexist", "homophobic", "transphobic",
-            "offensive language", "curse words", "profanity"
-        ]
-
-        if any(pattern in text.lower() for pattern in inappropriate_patterns):
-            violations.append("inappropriate_content")
-
-        # Check for misinformation
-        misinformation_patterns = [
-            "false", "incorrect", "wrong", "lie", "misleading",
-            "untrue", "fabricated", "made up", "fake information"
-        ]
-
-        if any(pattern in text.lower() for pattern in misinformation_patterns):
-            violations.append("misinformation")
-
-        # Check for unsafe instructions
-        unsafe_patterns = [
-            "how to hack", "how to steal", "how to make drugs",
-            "how to weapon", "illegal", "dangerous", "harmful",
-            "how to hurt", "how to damage", "how to break"
-        ]
-
-        if any(pattern in text.lower() for pattern in unsafe_patterns):
-            violations.append("unsafe_instructions")
-
-        # Check for privacy violations
-        privacy_patterns = [
-            "personal information", "private data", "confidential",
-            "sensitive information", "private details", "personal data"
-        ]
-
-        if any(pattern in text.lower() for pattern in privacy_patterns):
-            violations.append("privacy_violation")
-
-        return violations
-
-    def _assess_risk_level(self, text: str, result: Any) -> str:
-        """Assess the risk level of input text"""
-        violations = self._detect_violations(text)
+        return _scan(OUTPUT_VIOLATION_PREFILTER, OUTPUT_VIOLATION_REGEXES, text)
 
+    def _assess_risk_level(self, violations: List[str]) -> str:
+        """Assess the risk level of input violations"""
         if not violations:
             return "low"
 
@@ -358,12 +459,10 @@ assistant "I'm sorry, but I can't help with requests that attempt to bypass safe
 
         return "medium"
 
-    def _get_safety_suggestions(self, text: str) -> List[str]:
-        """Get safety suggestions for input text"""
+    def _get_safety_suggestions(self, violations: List[str]) -> List[str]:
+        """Get safety suggestions for input violations"""
         suggestions = []
 
-        violations = self._detect_violations(text)
-
         if "jailbreak_attempt" in violations:
             suggestions.append("Avoid attempting to override safety instructions")
 
@@ -406,22 +505,19 @@ assistant "I'm sorry, but I can't help with requests that attempt to bypass safe
             "config_path": self.config_path,
             "default_model": getattr(settings, 'OLLAMA_DEFAULT_MODEL', 'gpt-oss:20b'),
             "guardrails_model": getattr(settings, 'OLLAMA_DEFAULT_MODEL', 'gpt-oss:20b'),
-            "config_exists": os.path.exists(
-                os.path.join(self.config_path, 'config.yml')
-            ),
+            "config_exists": self._has_config or self._config_exists(),
             "using_custom_validation": self.use_custom_validation
         }
 
     def update_guardrails_config(self, config: Dict[str, Any]) -> bool:
         """Update the guardrails configuration"""
         try:
-            config_file = os.path.join(self.config_path, 'config.yml')
-
-            with open(config_file, 'w') as f:
-                yaml.dump(config, f, default_flow_style=False)
+            self._write_config(config)
 
             # Clear cache and reinitialize
             cache.delete('guardrails_config')
+            self._config_cache = None
+            self._config_key = None
 
             logger.info("Guardrails configuration updated successfully")
             return True
@@ -433,14 +529,27 @@ assistant "I'm sorry, but I can't help with requests that attempt to bypass safe
     def get_guardrails_config(self) -> Dict[str, Any]:
         """Get the current guardrails configuration"""
         try:
-            config_file = os.path.join(self.config_path, 'config.yml')
-
-            if os.path.exists(config_file):
-                with open(config_file, 'r') as f:
-                    return yaml.safe_load(f)
+            for filename in (self.CONFIG_FILENAME, self.LEGACY_CONFIG_FILENAME):
+                config_file = os.path.join(self.config_path, filename)
+                try:
+                    mtime = os.stat(config_file).st_mtime_ns
+                    break
+                except FileNotFoundError:
+                    continue
             else:
                 return self.default_config
 
+            # Only re-parse when the file has changed since the last load
+            if self._config_cache is None or self._config_key != (filename, mtime):
+                with open(config_file, 'r') as f:
+                    if filename == self.CONFIG_FILENAME:
+                        self._config_cache = json.load(f)
+                    else:
+                        self._config_cache = yaml.load(f, Loader=YAML_LOADER)
+                self._config_key = (filename, mtime)
+
+            return self._config_cache
+
         except Exception as e:
             logger.error(f"Failed to load guardrails config: {e}")
             return self.default_config
@@ -452,9 +561,17 @@ assistant "I'm sorry, but I can't help with requests that attempt to bypass safe
     ) -> Dict[str, Any]:
         """Moderate a conversation using custom safety checks"""
         try:
-            # Analyze for safety issues
-            conversation_text = " ".join([msg.get("content", "") for msg in messages])
-            violations = self._detect_violations(conversation_text)
+            # Scan every message in a single pass off the event loop
+            message_violations = await _in_thread(
+                _scan_messages,
+                INPUT_VIOLATION_PREFILTER,
+                INPUT_VIOLATION_REGEXES,
+                [msg.get("content", "") for msg in messages]
+            )
+
+            # Union of all message violations, in reporting order
+            found = set().union(*message_violations)
+            violations = [category for category in INPUT_VIOLATION_PATTERNS if category in found]
 
             # Extract content from GenerationResponse object
             content = "Conversation moderated"
@@ -464,7 +581,8 @@ assistant "I'm sorry, but I can't help with requests that attempt to bypass safe
                 "message": content,
                 "moderation": "applied",
                 "violations": violations,
-                "risk_level": self._assess_risk_level(conversation_text, None)
+                "message_violations": message_violations,
+                "risk_level": self._assess_risk_level(violations)
             }
 
         except Exception as e:
@@ -478,5 +596,19 @@ assistant "I'm sorry, but I can't help with requests that attempt to bypass safe
             }
 
 
-# Global service instance
-nemo_guardrails_service = NemoGuardrailsService()
+_service: Optional[NemoGuardrailsService] = None
+
+
+def get_guardrails_service() -> NemoGuardrailsService:
+    """Get the shared NemoGuardrailsService, creating it (and its config file) on first use"""
+    global _service
+    if _service is None:
+        _service = NemoGuardrailsService()
+    return _service
+
+
+def __getattr__(name):
+    # Keep `from prompts.guardrails_service import nemo_guardrails_service` working
+    if name == 'nemo_guardrails_service':
+        return get_guardrails_service()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -2,48 +2,200 @@
 Custom managers for the prompts app
 """
 
-from django.db import models
-from django.utils import timezone
+import uuid
+import logging
+from functools import lru_cache
+
+from django.conf import settings
+from django.contrib.postgres.search import SearchVector
+from django.db import connections, models
+from django.db.models import Q
+from django.db.models.functions import Cast, Length, Substr
+
+from .writers import get_writer
+
+logger = logging.getLogger(__name__)
+
+
+class PromptQuerySet(models.QuerySet):
+    """QuerySet for prompts"""
+
+    # Columns rendered by list endpoints (PromptListSerializer); FK ids must stay
+    # loaded or touching .category/.author would re-query per row
+    LIST_FIELDS = (
+        'id', 'title', 'description', 'tags', 'is_favorite', 'usage_count',
+        'is_active', 'current_version', 'created_at', 'updated_at',
+        'category__id', 'category__name', 'author__id', 'author__username',
+    )
+
+    # Columns search results render (SearchService._serialize_result and snippets); content
+    # is only read through the content_preview/content_length annotations of for_search()
+    SEARCH_FIELDS = (
+        'id', 'title', 'description', 'tags', 'usage_count', 'created_at',
+        'category__id', 'category__name', 'author__id', 'author__username',
+    )
+    CONTENT_PREVIEW_LENGTH = 500
+
+    # Columns folded into search_vector; saves that touch none of them keep the stored vector
+    SEARCH_VECTOR_FIELDS = frozenset(['title', 'description', 'content', 'tags'])
+
+    def with_related(self):
+        """Join the FK relations every prompt listing renders"""
+        return self.select_related('category', 'author')
+
+    def for_list(self):
+        """with_related() narrowed to the list columns, leaving out the prompt body"""
+        return self.with_related().only(*self.LIST_FIELDS)
+
+    def with_version_count(self):
+        """Annotate version_count_annotated, counted in the same query rather than once per prompt"""
+        return self.annotate(version_count_annotated=models.Count('versions'))
+
+    def for_search(self):
+        """with_related() narrowed to the columns search results render, with content truncated in SQL"""
+        # One character past the preview length is enough to know whether to add an ellipsis
+        return self.with_related().only(*self.SEARCH_FIELDS).annotate(
+            content_preview=Substr('content', 1, self.CONTENT_PREVIEW_LENGTH + 1),
+            content_length=Length('content')
+        )
+
+    def with_tags_text(self):
+        """Annotate tags_text, the tags joined by spaces, so tag filters can match substrings"""
+        return self.annotate(tags_text=models.Func(
+            'tags', models.Value(' '), function='array_to_string', output_field=models.TextField()
+        ))
+
+    def update_search_vectors(self):
+        """Recompute search_vector in SQL for every prompt in this queryset"""
+        return self.update(search_vector=(
+            SearchVector('title', weight='A', config='english') +
+            SearchVector(Cast('tags', models.TextField()), weight='B', config='english') +
+            SearchVector('description', weight='B', config='english') +
+            SearchVector('content', weight='C', config='english')
+        ))
+
+
+def approximate_count(model) -> int:
+    """Planner estimate of model's row count; exact count() where no estimate is available"""
+    connection = connections[model.objects.db]
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass",
+                [model._meta.db_table]
+            )
+            row = cursor.fetchone()
+        # reltuples is -1 until the table is first vacuumed or analyzed
+        if row is not None and row[0] >= 0:
+            return row[0]
+    return model.objects.count()
+
+
+def _as_uuid(value):
+    """value as a UUID, or None if it isn't one"""
+    if value is None or isinstance(value, uuid.UUID):
+        return value
+    try:
+        return uuid.UUID(str(value))
+    except ValueError:
+        return None
+
+
+@lru_cache(maxsize=None)
+def _trail_level(level, trail_levels):
+    """level if it is a known trail level, else 'all'; warns once per unknown value"""
+    if level in trail_levels:
+        return level
+    logger.warning(f"Unknown AUDIT_TRAIL_LEVEL {level!r}, recording all audit entries; expected one of {trail_levels}")
+    return 'all'
 
 
 class AuditLogManager(models.Manager):
     """Manager for audit log operations"""
 
+    # Columns audit listings show; the user join replaces a per-row lookup for the username
+    SUMMARY_FIELDS = (
+        'id', 'action', 'resource_type', 'resource_id', 'ip_address', 'timestamp',
+        'user__id', 'user__username',
+    )
+
+    def is_recorded(self, action) -> bool:
+        """Whether settings.AUDIT_TRAIL_LEVEL keeps entries for action"""
+        level = _trail_level(getattr(settings, 'AUDIT_TRAIL_LEVEL', 'all'), self.model.TRAIL_LEVELS)
+        if level == 'all':
+            return True
+        if level == 'writes_only':
+            return action not in self.model.READ_ACTIONS
+        if level == 'mutations_only':
+            return action not in self.model.READ_ACTIONS and action not in self.model.COUNTER_ACTIONS
+        return action in self.model.FAILURE_ACTIONS
+
     def log_action(self, user, action, resource_type, resource_id=None,
-                   details=None, ip_address=None, user_agent=None):
-        """Create an audit log entry"""
+                   details=None, ip_address=None, user_agent=None, immediate=False):
+        """Queue an audit log entry; it is written in the background in batches.
+
+        Pass immediate=True for entries that must be on disk before the request
+        returns (e.g. permission changes); those are saved synchronously.
+        Actions below settings.AUDIT_TRAIL_LEVEL are dropped and return None.
+        """
         try:
-            return self.create(
+            if not self.is_recorded(action):
+                return None
+            entry = self.model(
                 user=user,
                 action=action,
+                # bulk_create skips save(), so derive the flag here too
+                is_security=action in self.model.SECURITY_ACTIONS,
                 resource_type=resource_type,
-                resource_id=resource_id,
+                resource_id=resource_id or '',
+                resource_uuid=_as_uuid(resource_id),
                 details=details or {},
                 ip_address=ip_address,
-                user_agent=user_agent,
-                timestamp=timezone.now()
+                user_agent=user_agent or ''
             )
-        except Exception as e:
-            # Log to console but don't break the application
-            print(f"Failed to create audit log: {e}")
+            if immediate:
+                entry.save()
+            else:
+                get_writer(self.model).put(entry)
+            return entry
+        except Exception:
+            # Never break the request over an audit entry
+            logger.exception("Failed to record audit log")
             return None
 
-    def get_logs_for_user(self, user, limit=50):
+    def _summaries(self, before=None):
+        """Newest-first summaries, optionally only those after the before cursor.
+
+        Page with before=(timestamp, id) of the last row already shown rather than an
+        offset; each page is then a bounded range read off the timestamp index. The id
+        breaks ties between entries written in the same batch or the same tick.
+        """
+        queryset = self.select_related('user').only(*self.SUMMARY_FIELDS)
+        if before is not None:
+            timestamp, pk = before
+            queryset = queryset.filter(Q(timestamp__lt=timestamp) | Q(timestamp=timestamp, id__lt=pk))
+        return queryset.order_by('-timestamp', '-id')
+
+    def get_logs_for_user(self, user, limit=50, before=None):
         """Get audit logs for a specific user"""
-        return self.filter(user=user).order_by('-timestamp')[:limit]
+        # Served by the (user, -timestamp) index
+        return self._summaries(before).filter(user=user)[:limit]
 
-    def get_logs_for_resource(self, resource_type, resource_id, limit=50):
+    def get_logs_for_resource(self, resource_type, resource_id, limit=50, before=None):
         """Get audit logs for a specific resource"""
-        return self.filter(
+        # UUID ids compare on the native resource_uuid column; others on the resource_id text.
+        # Served by the (resource_type, resource_uuid|resource_id, -timestamp) indexes
+        resource_uuid = _as_uuid(resource_id)
+        if resource_uuid is not None:
+            lookup = {'resource_uuid': resource_uuid}
+        else:
+            lookup = {'resource_id': resource_id}
+        return self._summaries(before).filter(
             resource_type=resource_type,
-            resource_id=resource_id
-        ).order_by('-timestamp')[:limit]
+            **lookup
+        )[:limit]
 
-    def get_security_logs(self, limit=100):
+    def get_security_logs(self, limit=100, before=None):
         """Get security-related logs"""
-        security_actions = [
-            'LOGIN', 'LOGOUT', 'LOGIN_FAILED', 'PASSWORD_CHANGE',
-            'PERMISSION_CHANGE', 'USER_CREATE', 'USER_DELETE',
-            'SUSPICIOUS_ACTIVITY', 'RATE_LIMIT_EXCEEDED'
-        ]
-        return self.filter(action__in=security_actions).order_by('-timestamp')[:limit]
+        # Served by the partial index on is_security
+        return self._summaries(before).filter(is_security=True)[:limit]
@@ -0,0 +1,130 @@
+# Generated by Django 4.2.7 on 2026-10-15 07:33
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('contenttypes', '0002_remove_content_type_name'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Category',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('name', models.CharField(max_length=100, unique=True)),
+                ('description', models.TextField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Prompt',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('title', models.CharField(max_length=200)),
+                ('description', models.TextField(blank=True, null=True)),
+                ('content', models.TextField()),
+                ('tags', models.JSONField(blank=True, default=list)),
+                ('is_favorite', models.BooleanField(default=False)),
+                ('usage_count', models.PositiveIntegerField(default=0)),
+                ('last_used_at', models.DateTimeField(blank=True, null=True)),
+                ('is_active', models.BooleanField(default=True)),
+                ('current_version', models.PositiveIntegerField(default=1)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('author', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='prompts', to=settings.AUTH_USER_MODEL)),
+                ('category', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='prompts', to='prompts.category')),
+            ],
+            options={
+                'ordering': ['-updated_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='GuardrailsConfig',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True)),
+                ('description', models.TextField(blank=True)),
+                ('config_type', models.CharField(choices=[('input_validation', 'Input Validation'), ('output_moderation', 'Output Moderation'), ('conversation_control', 'Conversation Control'), ('content_filtering', 'Content Filtering'), ('custom_rules', 'Custom Rules')], max_length=50)),
+                ('configuration', models.JSONField()),
+                ('is_active', models.BooleanField(default=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('created_by', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='guardrails_configs', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='PromptVersion',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('version_number', models.PositiveIntegerField()),
+                ('title', models.CharField(max_length=200)),
+                ('description', models.TextField(blank=True, null=True)),
+                ('content', models.TextField()),
+                ('tags', models.JSONField(blank=True, default=list)),
+                ('change_summary', models.TextField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('author', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='prompt_versions', to=settings.AUTH_USER_MODEL)),
+                ('category', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='prompts.category')),
+                ('prompt', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='versions', to='prompts.prompt')),
+            ],
+            options={
+                'ordering': ['-version_number'],
+                'unique_together': {('prompt', 'version_number')},
+            },
+        ),
+        migrations.CreateModel(
+            name='GuardrailsLog',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('action_type', models.CharField(choices=[('input_validation', 'Input Validation'), ('output_moderation', 'Output Moderation'), ('conversation_moderation', 'Conversation Moderation'), ('jailbreak_attempt', 'Jailbreak Attempt'), ('content_violation', 'Content Violation'), ('rate_limit', 'Rate Limit Exceeded')], max_length=50)),
+                ('log_level', models.CharField(choices=[('info', 'Information'), ('warning', 'Warning'), ('error', 'Error'), ('critical', 'Critical')], default='info', max_length=20)),
+                ('message', models.TextField()),
+                ('details', models.JSONField(blank=True, default=dict)),
+                ('ip_address', models.GenericIPAddressField(blank=True, null=True)),
+                ('user_agent', models.TextField(blank=True)),
+                ('allowed', models.BooleanField(default=True)),
+                ('risk_level', models.CharField(choices=[('low', 'Low'), ('medium', 'Medium'), ('high', 'High')], default='low', max_length=20)),
+                ('timestamp', models.DateTimeField(auto_now_add=True)),
+                ('prompt', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='guardrails_logs', to='prompts.prompt')),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='guardrails_logs', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-timestamp'],
+                'indexes': [models.Index(fields=['user', '-timestamp'], name='prompts_gua_user_id_ceae5a_idx'), models.Index(fields=['action_type', '-timestamp'], name='prompts_gua_action__8154e2_idx'), models.Index(fields=['log_level', '-timestamp'], name='prompts_gua_log_lev_7da707_idx'), models.Index(fields=['timestamp'], name='prompts_gua_timesta_eda7e7_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='AuditLog',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('action', models.CharField(choices=[('LOGIN', 'User Login'), ('LOGOUT', 'User Logout'), ('LOGIN_FAILED', 'Failed Login Attempt'), ('PASSWORD_CHANGE', 'Password Change'), ('PASSWORD_RESET', 'Password Reset'), ('USER_CREATE', 'User Created'), ('USER_UPDATE', 'User Updated'), ('USER_DELETE', 'User Deleted'), ('PERMISSION_CHANGE', 'Permission Changed'), ('PROMPT_CREATE', 'Prompt Created'), ('PROMPT_UPDATE', 'Prompt Updated'), ('PROMPT_DELETE', 'Prompt Deleted'), ('PROMPT_VIEW', 'Prompt Viewed'), ('PROMPT_USE', 'Prompt Used'), ('CATEGORY_CREATE', 'Category Created'), ('CATEGORY_UPDATE', 'Category Updated'), ('CATEGORY_DELETE', 'Category Deleted'), ('AI_SUGGESTION', 'AI Suggestion Generated'), ('AI_IMPROVEMENT', 'AI Improvement Applied'), ('AI_ANALYSIS', 'AI Analysis Performed'), ('SUSPICIOUS_ACTIVITY', 'Suspicious Activity Detected'), ('RATE_LIMIT_EXCEEDED', 'Rate Limit Exceeded'), ('UNAUTHORIZED_ACCESS', 'Unauthorized Access Attempt'), ('DATA_EXPORT', 'Data Export')], max_length=50)),
+                ('resource_type', models.CharField(blank=True, max_length=100)),
+                ('resource_id', models.CharField(blank=True, max_length=100)),
+                ('object_id', models.CharField(blank=True, max_length=100)),
+                ('details', models.JSONField(blank=True, default=dict)),
+                ('ip_address', models.GenericIPAddressField(blank=True, null=True)),
+                ('user_agent', models.TextField(blank=True)),
+                ('timestamp', models.DateTimeField(default=django.utils.timezone.now)),
+                ('content_type', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='contenttypes.contenttype')),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='audit_logs', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-timestamp'],
+                'indexes': [models.Index(fields=['user', '-timestamp'], name='prompts_aud_user_id_859ca7_idx'), models.Index(fields=['action', '-timestamp'], name='prompts_aud_action_ea2f64_idx'), models.Index(fields=['resource_type', 'resource_id', '-timestamp'], name='prompts_aud_resourc_5f5da4_idx'), models.Index(fields=['timestamp'], name='prompts_aud_timesta_12a313_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,144 @@
+# Generated by Django 4.2.7 on 2026-10-15 07:33
+
+import django.contrib.postgres.fields
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.contrib.postgres.search import SearchVector
+from django.db import migrations, models
+from django.db.models.functions import Cast
+import django.db.models.deletion
+
+# Actions AuditLog.SECURITY_ACTIONS flags, as of this migration
+SECURITY_ACTIONS = [
+    'LOGIN', 'LOGOUT', 'LOGIN_FAILED', 'PASSWORD_CHANGE',
+    'PERMISSION_CHANGE', 'USER_CREATE', 'USER_DELETE',
+    'SUSPICIOUS_ACTIVITY', 'RATE_LIMIT_EXCEEDED',
+]
+UUID_PATTERN = '^[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}$'
+
+
+def tags_to_array_sql(table):
+    return f"""
+        ALTER TABLE {table} ADD COLUMN tags_array varchar(50)[] NOT NULL DEFAULT '{{}}';
+        UPDATE {table} SET tags_array = ARRAY(
+            SELECT left(tag, 50) FROM jsonb_array_elements_text(
+                CASE WHEN jsonb_typeof(tags) = 'array' THEN tags ELSE '[]'::jsonb END
+            ) AS tag
+        );
+        ALTER TABLE {table} DROP COLUMN tags;
+        ALTER TABLE {table} RENAME COLUMN tags_array TO tags;
+        ALTER TABLE {table} ALTER COLUMN tags DROP DEFAULT;
+    """
+
+
+def tags_to_json_sql(table):
+    return f"""
+        ALTER TABLE {table} ALTER COLUMN tags TYPE jsonb USING to_jsonb(tags);
+    """
+
+
+def backfill_search_vectors(apps, schema_editor):
+    # Same vector as PromptQuerySet.update_search_vectors(); later saves keep it current
+    Prompt = apps.get_model('prompts', 'Prompt')
+    Prompt.objects.update(search_vector=(
+        SearchVector('title', weight='A', config='english') +
+        SearchVector(Cast('tags', models.TextField()), weight='B', config='english') +
+        SearchVector('description', weight='B', config='english') +
+        SearchVector('content', weight='C', config='english')
+    ))
+
+
+def backfill_audit_columns(apps, schema_editor):
+    AuditLog = apps.get_model('prompts', 'AuditLog')
+    AuditLog.objects.filter(action__in=SECURITY_ACTIONS).update(is_security=True)
+    AuditLog.objects.filter(resource_id__regex=UUID_PATTERN).update(
+        resource_uuid=Cast('resource_id', models.UUIDField())
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('prompts', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PromptEmbedding',
+            fields=[
+                ('prompt', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='embedding', serialize=False, to='prompts.prompt')),
+                ('vector', models.BinaryField()),
+                ('model', models.CharField(max_length=50)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='auditlog',
+            name='is_security',
+            field=models.BooleanField(default=False, editable=False),
+        ),
+        migrations.AddField(
+            model_name='auditlog',
+            name='resource_uuid',
+            field=models.UUIDField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='prompt',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        # jsonb can't be cast to an array in place, so each tags column is rebuilt from its elements
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                migrations.RunSQL(tags_to_array_sql(table), reverse_sql=tags_to_json_sql(table))
+                for table in ('prompts_prompt', 'prompts_promptversion')
+            ],
+            state_operations=[
+                migrations.AlterField(
+                    model_name='prompt',
+                    name='tags',
+                    field=django.contrib.postgres.fields.ArrayField(base_field=models.CharField(max_length=50), blank=True, default=list, size=None),
+                ),
+                migrations.AlterField(
+                    model_name='promptversion',
+                    name='tags',
+                    field=django.contrib.postgres.fields.ArrayField(base_field=models.CharField(max_length=50), blank=True, default=list, size=None),
+                ),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='auditlog',
+            index=models.Index(fields=['resource_type', 'resource_uuid', '-timestamp'], name='prompts_aud_resourc_4e9ece_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='auditlog',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['details'], name='audit_details_gin', opclasses=['jsonb_path_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='auditlog',
+            index=models.Index(condition=models.Q(('is_security', True)), fields=['-timestamp'], name='auditlog_security_ts'),
+        ),
+        migrations.AddIndex(
+            model_name='guardrailslog',
+            index=models.Index(fields=['risk_level', '-timestamp'], name='prompts_gua_risk_le_2d4187_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='prompt',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='prompt_search_vector_gin'),
+        ),
+        migrations.AddIndex(
+            model_name='prompt',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['-updated_at'], name='prompt_active_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='prompt',
+            index=models.Index(fields=['category', 'is_active'], name='prompt_category_active_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='prompt',
+            index=models.Index(fields=['author', 'is_active'], name='prompt_author_active_idx'),
+        ),
+        # Data backfills come last; Postgres won't build indexes on a table with pending trigger events
+        migrations.RunPython(backfill_search_vectors, migrations.RunPython.noop),
+        migrations.RunPython(backfill_audit_columns, migrations.RunPython.noop),
+    ]
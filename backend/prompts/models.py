@@ -1,10 +1,23 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import Case, ExpressionWrapper, F, Max, Q, Value, When
 from django.contrib.auth.models import User
 from django.contrib.contenttypes.fields import GenericForeignKey
 from django.contrib.contenttypes.models import ContentType
+from django.contrib.postgres.fields import ArrayField
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from django.utils import timezone
 import uuid
-from .managers import AuditLogManager
+import logging
+import orjson
+import yaml
+from .managers import AuditLogManager, PromptQuerySet
+from .writers import get_writer
+
+logger = logging.getLogger(__name__)
+
+# Use the libyaml-backed dumper when PyYAML was built with it
+YAML_DUMPER = getattr(yaml, 'CSafeDumper', yaml.SafeDumper)
 
 
 class Category(models.Model):
@@ -26,30 +39,78 @@ class Prompt(models.Model):
     description = models.TextField(blank=True, null=True)
     content = models.TextField()
     category = models.ForeignKey(Category, on_delete=models.SET_NULL, null=True, blank=True, related_name='prompts')
-    tags = models.JSONField(default=list, blank=True)
+    tags = ArrayField(models.CharField(max_length=50), default=list, blank=True)
     author = models.ForeignKey(User, on_delete=models.CASCADE, related_name='prompts')
     is_favorite = models.BooleanField(default=False)
     usage_count = models.PositiveIntegerField(default=0)
     last_used_at = models.DateTimeField(null=True, blank=True)
     is_active = models.BooleanField(default=True)  # Soft delete flag
 
+    # Full-text index of title/tags/description/content, maintained by signals.refresh_prompt_search_vector
+    search_vector = SearchVectorField(null=True, editable=False)
+
     # Versioning fields
     current_version = models.PositiveIntegerField(default=1)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = PromptQuerySet.as_manager()
+
     class Meta:
         ordering = ['-updated_at']
+        indexes = [
+            GinIndex(fields=['search_vector'], name='prompt_search_vector_gin'),
+            # Active prompts in the default (-updated_at) order, as searches and listings read them
+            models.Index(
+                fields=['-updated_at'],
+                name='prompt_active_updated_idx',
+                condition=Q(is_active=True)
+            ),
+            models.Index(fields=['category', 'is_active'], name='prompt_category_active_idx'),
+            models.Index(fields=['author', 'is_active'], name='prompt_author_active_idx'),
+        ]
 
     def __str__(self):
         return self.title
 
     def increment_usage(self):
         """Increment the usage count and update last_used_at"""
-        from django.utils import timezone
+        # Increment in SQL so concurrent uses can't overwrite each other's count
+        now = timezone.now()
+        Prompt.objects.filter(pk=self.pk).update(usage_count=F('usage_count') + 1, last_used_at=now)
         self.usage_count += 1
-        self.last_used_at = timezone.now()
-        self.save(update_fields=['usage_count', 'last_used_at'])
+        self.last_used_at = now
+
+    def toggle_favorite(self):
+        """Flip is_favorite"""
+        # Flip in SQL, touching only this flag and updated_at, so concurrent toggles both apply;
+        # the row lock the UPDATE takes makes the read-back this toggle's result
+        now = timezone.now()
+        queryset = Prompt.objects.filter(pk=self.pk)
+        with transaction.atomic():
+            queryset.update(
+                is_favorite=Case(When(is_favorite=True, then=Value(False)), default=Value(True)),
+                updated_at=now
+            )
+            self.is_favorite = queryset.values_list('is_favorite', flat=True).get()
+        self.updated_at = now
+
+
+class PromptEmbedding(models.Model):
+    """Stored semantic search embedding for a prompt, refreshed when the prompt is saved"""
+    prompt = models.OneToOneField(
+        Prompt,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='embedding'
+    )
+    vector = models.BinaryField()  # float32 array bytes
+    model = models.CharField(max_length=50)  # embeddings.EMBEDDING_MODEL that produced vector
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Embedding for {self.prompt_id}"
+
 
 class PromptVersion(models.Model):
     """Model for tracking different versions of prompts"""
@@ -60,7 +121,7 @@ class PromptVersion(models.Model):
     description = models.TextField(blank=True, null=True)
     content = models.TextField()
     category = models.ForeignKey(Category, on_delete=models.SET_NULL, null=True, blank=True)
-    tags = models.JSONField(default=list, blank=True)
+    tags = ArrayField(models.CharField(max_length=50), default=list, blank=True)
     author = models.ForeignKey(User, on_delete=models.CASCADE, related_name='prompt_versions')
     change_summary = models.TextField(blank=True, null=True)  # Description of what changed
     created_at = models.DateTimeField(auto_now_add=True)
@@ -75,8 +136,11 @@ class PromptVersion(models.Model):
     def save(self, *args, **kwargs):
         # Auto-increment version number if not provided
         if not self.version_number:
-            last_version = self.prompt.versions.order_by('-version_number').first()
-            self.version_number = (last_version.version_number if last_version else 0) + 1
+            # MAX() is answered from the (prompt, version_number) unique index
+            last_number = PromptVersion.objects.filter(
+                prompt_id=self.prompt_id
+            ).aggregate(last=Max('version_number'))['last']
+            self.version_number = (last_number or 0) + 1
         super().save(*args, **kwargs)
 
 
@@ -121,6 +185,23 @@ class AuditLog(models.Model):
         ('DATA_EXPORT', 'Data Export'),
     ]
 
+    SECURITY_ACTIONS = frozenset([
+        'LOGIN', 'LOGOUT', 'LOGIN_FAILED', 'PASSWORD_CHANGE',
+        'PERMISSION_CHANGE', 'USER_CREATE', 'USER_DELETE',
+        'SUSPICIOUS_ACTIVITY', 'RATE_LIMIT_EXCEEDED'
+    ])
+
+    # settings.AUDIT_TRAIL_LEVEL values, from least to most recorded
+    TRAIL_LEVELS = ('failures_only', 'mutations_only', 'writes_only', 'all')
+    FAILURE_ACTIONS = frozenset([
+        'LOGIN_FAILED', 'SUSPICIOUS_ACTIVITY', 'RATE_LIMIT_EXCEEDED', 'UNAUTHORIZED_ACCESS'
+    ])
+    # Writes that change no content, only counters
+    COUNTER_ACTIONS = frozenset(['PROMPT_USE'])
+    READ_ACTIONS = frozenset([
+        'PROMPT_VIEW', 'PROMPT_SEARCH', 'AI_SUGGESTION', 'AI_IMPROVEMENT', 'AI_ANALYSIS'
+    ])
+
     user = models.ForeignKey(
         User,
         on_delete=models.SET_NULL,
@@ -129,8 +210,10 @@ class AuditLog(models.Model):
         related_name='audit_logs'
     )
     action = models.CharField(max_length=50, choices=ACTION_CHOICES)
+    is_security = models.BooleanField(default=False, editable=False)  # Derived from action on save
     resource_type = models.CharField(max_length=100, blank=True)  # e.g., 'prompt', 'category'
     resource_id = models.CharField(max_length=100, blank=True)  # ID of the resource
+    resource_uuid = models.UUIDField(null=True, blank=True)  # resource_id, when it is a UUID
 
     # Generic foreign key for flexible resource linking
     content_type = models.ForeignKey(ContentType, on_delete=models.CASCADE, null=True, blank=True)
@@ -150,31 +233,40 @@ class AuditLog(models.Model):
             models.Index(fields=['user', '-timestamp']),
             models.Index(fields=['action', '-timestamp']),
             models.Index(fields=['resource_type', 'resource_id', '-timestamp']),
+            models.Index(fields=['resource_type', 'resource_uuid', '-timestamp']),
             models.Index(fields=['timestamp']),
+            # Containment (details @> {...}) lookups for analytics
+            GinIndex(fields=['details'], name='audit_details_gin', opclasses=['jsonb_path_ops']),
+            # Only security events are indexed, so get_security_logs reads a small index in order
+            models.Index(
+                fields=['-timestamp'],
+                name='auditlog_security_ts',
+                condition=models.Q(is_security=True)
+            ),
         ]
 
     def __str__(self):
         user_info = f"{self.user.username}" if self.user else "Anonymous"
         return f"{user_info} - {self.action} - {self.timestamp}"
 
+    def save(self, *args, **kwargs):
+        self.is_security = self.action in self.SECURITY_ACTIONS
+        super().save(*args, **kwargs)
+
     @classmethod
     def log_user_action(cls, user, action, resource_type, resource_id=None,
-                       details=None, ip_address=None, user_agent=None):
-        """Create an audit log entry for user actions"""
-        try:
-            return cls.objects.create(
-                user=user,
-                action=action,
-                resource_type=resource_type,
-                resource_id=resource_id,
-                details=details or {},
-                ip_address=ip_address,
-                user_agent=user_agent
-            )
-        except Exception as e:
-            # Don't break the application if logging fails
-            print(f"Failed to create audit log: {e}")
-            return None
+                       details=None, ip_address=None, user_agent=None, immediate=False):
+        """Queue an audit log entry for user actions; see AuditLogManager.log_action"""
+        return cls.objects.log_action(
+            user,
+            action,
+            resource_type,
+            resource_id=resource_id,
+            details=details,
+            ip_address=ip_address,
+            user_agent=user_agent,
+            immediate=immediate
+        )
 
 
 class GuardrailsConfig(models.Model):
@@ -205,19 +297,28 @@ class GuardrailsConfig(models.Model):
 
     def activate(self):
         """Activate this guardrails configuration"""
-        # Deactivate all other configs of the same type
+        # Activate this config and deactivate all others of the same type in one UPDATE
+        now = timezone.now()
+        is_self = Q(pk=self.pk)
         GuardrailsConfig.objects.filter(
-            config_type=self.config_type,
-            is_active=True
-        ).update(is_active=False)
+            is_self | Q(config_type=self.config_type, is_active=True)
+        ).update(
+            is_active=ExpressionWrapper(is_self, output_field=models.BooleanField()),
+            updated_at=Case(When(is_self, then=Value(now)), default=F('updated_at'))
+        )
 
         self.is_active = True
-        self.save()
+        self.updated_at = now
 
     def get_yaml_config(self):
         """Convert JSON config back to YAML format"""
-        import yaml
-        return yaml.dump(self.configuration, default_flow_style=False)
+        # Memoized per instance, keyed on the configuration's JSON so edits are picked up
+        key = orjson.dumps(self.configuration)
+        cached = getattr(self, '_yaml_config', None)
+        if cached is None or cached[0] != key:
+            cached = (key, yaml.dump(self.configuration, Dumper=YAML_DUMPER, default_flow_style=False))
+            self._yaml_config = cached
+        return cached[1]
 
 
 class GuardrailsLog(models.Model):
@@ -280,6 +381,7 @@ class GuardrailsLog(models.Model):
             models.Index(fields=['user', '-timestamp']),
             models.Index(fields=['action_type', '-timestamp']),
             models.Index(fields=['log_level', '-timestamp']),
+            models.Index(fields=['risk_level', '-timestamp']),
             models.Index(fields=['timestamp']),
         ]
 
@@ -300,9 +402,9 @@ class GuardrailsLog(models.Model):
         risk_level='low',
         log_level='info'
     ):
-        """Create a guardrails log entry"""
+        """Queue a guardrails log entry; it is written in the background in batches"""
         try:
-            return cls.objects.create(
+            entry = cls(
                 user=user,
                 action_type=action_type,
                 log_level=log_level,
@@ -310,11 +412,13 @@ class GuardrailsLog(models.Model):
                 details=details or {},
                 prompt=prompt,
                 ip_address=ip_address,
-                user_agent=user_agent,
+                user_agent=user_agent or '',
                 allowed=allowed,
                 risk_level=risk_level
             )
-        except Exception as e:
+            get_writer(cls).put(entry)
+            return entry
+        except Exception:
             # Don't break the application if logging fails
-            logger.error(f"Failed to create guardrails log: {e}")
+            logger.exception("Failed to queue guardrails log")
             return None
@@ -0,0 +1,70 @@
+"""
+Pagination classes for the prompts app
+"""
+
+import hashlib
+from functools import partial
+
+import orjson
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.utils.functional import cached_property
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+
+
+class CachedCountPaginator(Paginator):
+    """Paginator that reads its total from the cache unless told to recount"""
+
+    def __init__(self, object_list, per_page, cache_key, refresh=False, timeout=300, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self.cache_key = cache_key
+        self.refresh = refresh
+        self.timeout = timeout
+
+    @cached_property
+    def count(self):
+        if not self.refresh:
+            count = cache.get(self.cache_key)
+            if count is not None:
+                return count
+        count = Paginator.count.func(self)
+        cache.set(self.cache_key, count, self.timeout)
+        return count
+
+
+class CachedCountPagination(PageNumberPagination):
+    """PageNumberPagination that counts on the first page and reuses the total for later pages"""
+
+    count_cache_timeout = 300
+
+    def paginate_queryset(self, queryset, request, view=None):
+        page_number = request.query_params.get(self.page_query_param, 1)
+        self.django_paginator_class = partial(
+            CachedCountPaginator,
+            cache_key=self._count_cache_key(request),
+            refresh=str(page_number) in ('1', 'last'),
+            timeout=self.count_cache_timeout
+        )
+        return super().paginate_queryset(queryset, request, view)
+
+    def _count_cache_key(self, request) -> str:
+        # Everything that shapes the queryset: endpoint, user (non-staff see their own rows) and filters
+        params = {
+            key: request.query_params.getlist(key)
+            for key in request.query_params
+            if key not in (self.page_query_param, self.page_size_query_param)
+        }
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update(request.path.encode('utf-8'))
+        digest.update(b'\x00')
+        digest.update(str(request.user.pk).encode('utf-8'))
+        digest.update(b'\x00')
+        digest.update(orjson.dumps(params, option=orjson.OPT_SORT_KEYS))
+        return f"pagination_count_{digest.hexdigest()}"
+
+
+class AuditLogCursorPagination(CursorPagination):
+    """Keyset pagination over the newest-first log; deep pages cost the same as the first"""
+
+    ordering = '-timestamp'
+    page_size = 50
@@ -0,0 +1,15 @@
+"""
+Custom permissions for the prompts app
+"""
+
+from rest_framework.permissions import BasePermission
+
+
+class IsAuthorOrStaff(BasePermission):
+    """Allow access to an object only to its author or to staff users"""
+
+    message = "You can only update your own prompts."
+
+    def has_object_permission(self, request, view, obj):
+        # Compare the FK id so the author row is never loaded
+        return obj.author_id == request.user.id or request.user.is_staff
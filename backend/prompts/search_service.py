@@ -9,25 +9,49 @@ Provides comprehensive search capabilities including:
 """
 
 import re
-import json
+import orjson
+import uuid
 import hashlib
+from collections import Counter
+from functools import lru_cache
 from typing import List, Dict, Tuple, Optional, Any
-from django.db.models import Q, Value, TextField, FloatField
-from django.db.models.functions import Concat
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db.models import F, Q, Value, FloatField
+from django.db.models import Window
+from django.db.models.functions import Lower, RowNumber
 from django.core.cache import cache
 from django.conf import settings
 from django.utils import timezone
-from datetime import timedelta
 import numpy as np
-from sklearn.metrics.pairwise import cosine_similarity
 from sklearn.feature_extraction.text import TfidfVectorizer
 import logging
 
-from ..models import Prompt, Category
-from .ai_service import ollama_service
+from .managers import PromptQuerySet
+from .models import Prompt, PromptEmbedding
+from .embeddings import (
+    EMBEDDING_DTYPE, EMBEDDING_MATRIX_GENERATION_KEY, EMBEDDING_MODEL,
+    embedding_text, stack_embeddings, text_embedding
+)
 
 logger = logging.getLogger(__name__)
 
+SEARCH_CACHE_GENERATION_KEY = 'search:generation'
+
+# Tokenizer for advanced queries: a quoted phrase, or a run of non-space, non-quote characters
+QUERY_TOKEN_RE = re.compile(r'"(?P<phrase>[^"]*)"|(?P<word>[^\s"]+)')
+QUERY_OPERATORS = {'and': 'must', 'or': 'should', 'not': 'must_not'}
+QUERY_FIELDS = frozenset(['title', 'content', 'description', 'tags', 'category'])
+
+
+@lru_cache(maxsize=256)
+def _highlight_pattern(terms: Tuple[str, ...]) -> Optional[re.Pattern]:
+    """One case-insensitive alternation of the highlightable terms, compiled once per term set"""
+    # Only highlight terms longer than 2 chars; longest first so overlapping terms mark the longer match
+    terms = sorted({term for term in terms if len(term) > 2}, key=len, reverse=True)
+    if not terms:
+        return None
+    return re.compile('|'.join(map(re.escape, terms)), re.IGNORECASE)
+
 
 class SearchService:
     """Advanced search service with semantic capabilities"""
@@ -36,6 +60,7 @@ class SearchService:
         self.cache_timeout = getattr(settings, 'SEARCH_CACHE_TIMEOUT', 300)  # 5 minutes
         self.max_results = getattr(settings, 'SEARCH_MAX_RESULTS', 100)
         self.semantic_threshold = getattr(settings, 'SEMANTIC_SEARCH_THRESHOLD', 0.3)
+        self.embedding_cache_timeout = getattr(settings, 'SEARCH_EMBEDDING_CACHE_TIMEOUT', 3600)  # 1 hour
 
         # Initialize TF-IDF vectorizer for text search
         self.tfidf_vectorizer = TfidfVectorizer(
@@ -81,17 +106,24 @@ class SearchService:
             parsed_query = self._parse_advanced_query(query)
 
             if semantic:
-                results = self._semantic_search(parsed_query, filters)
+                hits = self._semantic_search(parsed_query, filters)
             else:
-                results = self._text_search(parsed_query, filters)
+                hits = self._text_search(parsed_query, filters)
 
-            # Apply post-processing
-            results = self._post_process_results(results, query)
+            # Text hits come back deduplicated by the database
+            if semantic:
+                hits = self._post_process_results(hits, query)
+
+            # Only the returned page is serialized and highlighted
+            results = [
+                self._serialize_result(prompt, score, parsed_query)
+                for prompt, score in hits[:self.max_results]
+            ]
 
             # Add search metadata
             result_data = {
-                'results': results[:self.max_results],
-                'total': len(results),
+                'results': results,
+                'total': len(hits),
                 'query': query,
                 'search_type': 'semantic' if semantic else 'text',
                 'execution_time': (timezone.now() - start_time).total_seconds(),
@@ -132,56 +164,51 @@ class SearchService:
             'fields': {}     # Field-specific searches
         }
 
-        # Remove extra whitespace
-        query = re.sub(r'\s+', ' ', query.strip())
-
-        # Find quoted phrases first
-        phrase_pattern = r'"([^"]*)"'
-        phrases = re.findall(phrase_pattern, query)
-        for phrase in phrases:
-            parsed['phrases'].append(phrase.strip())
-            query = query.replace(f'"{phrase}"', '')
-
-        # Parse operators
-        terms = query.split()
-
-        i = 0
-        while i < len(terms):
-            term = terms[i].lower()
-
-            if term in ['and', 'or', 'not']:
-                operator = term.upper()
-                i += 1
-                if i < len(terms):
-                    next_term = ' '.join(terms[i:])
-                    if operator == 'NOT':
-                        parsed['must_not'].append(next_term)
-                    elif operator == 'OR':
-                        parsed['should'].append(next_term)
-                    else:  # AND
-                        parsed['must'].append(next_term)
-                    break
+        # One pass over the query: quoted phrases anywhere, everything else as whitespace-separated words
+        operator_bucket = None  # Set once an operator has been seen; later words all go to it
+        operator_words = []
+        index = 0
+
+        for match in QUERY_TOKEN_RE.finditer(query):
+            phrase = match.group('phrase')
+            if phrase is not None:
+                parsed['phrases'].append(phrase.strip())
+                continue
+
+            word = match.group('word')
+            if operator_bucket is not None:
+                operator_words.append(word)
+                continue
+
+            term = word.lower()
+            if term in QUERY_OPERATORS:
+                operator_bucket = QUERY_OPERATORS[term]
             elif ':' in term:
                 # Field-specific search
                 field, value = term.split(':', 1)
-                if field in ['title', 'content', 'description', 'tags', 'category']:
-                    if field not in parsed['fields']:
-                        parsed['fields'][field] = []
-                    parsed['fields'][field].append(value)
+                if field in QUERY_FIELDS:
+                    parsed['fields'].setdefault(field, []).append(value)
             else:
                 # Regular term
-                if i == 0:
+                if index == 0:
                     parsed['must'].append(term)
                 else:
                     parsed['should'].append(term)
 
-            i += 1
+            index += 1
+
+        # An operator applies to the rest of the query, as typed
+        if operator_words:
+            parsed[operator_bucket].append(' '.join(operator_words))
 
         return parsed
 
-    def _text_search(self, parsed_query: Dict, filters: Dict = None) -> List[Dict]:
-        """Perform traditional text-based search"""
-        queryset = Prompt.objects.select_related('category', 'author').filter(is_active=True)
+    def _text_search(self, parsed_query: Dict, filters: Dict = None) -> List[Tuple[Prompt, float]]:
+        """Perform traditional text-based search, returning (prompt, relevance score) hits"""
+        queryset = Prompt.objects.for_search().filter(is_active=True)
+        # Tag filters match substrings of any tag, against the joined tags_text
+        if (filters and filters.get('tags')) or 'tags' in parsed_query['fields']:
+            queryset = queryset.with_tags_text()
 
         # Apply filters
         if filters:
@@ -191,40 +218,29 @@ class SearchService:
                 queryset = queryset.filter(author__username__icontains=filters['author'])
             if filters.get('tags'):
                 for tag in filters['tags']:
-                    queryset = queryset.filter(tags__icontains=tag)
+                    queryset = queryset.filter(tags_text__icontains=tag)
 
-        # Build search query
-        search_q = Q()
+        # Build the full-text query; terms are stemmed and matched against search_vector
+        text_query = None
 
         # Must terms (AND)
         for term in parsed_query['must']:
-            search_q &= (
-                Q(title__icontains=term) |
-                Q(description__icontains=term) |
-                Q(content__icontains=term) |
-                Q(tags__icontains=term)
-            )
+            term_query = SearchQuery(term, config='english')
+            text_query = term_query if text_query is None else text_query & term_query
 
         # Should terms (OR)
-        if parsed_query['should']:
-            should_q = Q()
-            for term in parsed_query['should']:
-                should_q |= (
-                    Q(title__icontains=term) |
-                    Q(description__icontains=term) |
-                    Q(content__icontains=term) |
-                    Q(tags__icontains=term)
-                )
-            search_q |= should_q
+        for term in parsed_query['should']:
+            term_query = SearchQuery(term, config='english')
+            text_query = term_query if text_query is None else text_query | term_query
 
         # Must not terms (NOT)
         for term in parsed_query['must_not']:
-            search_q &= ~(
-                Q(title__icontains=term) |
-                Q(description__icontains=term) |
-                Q(content__icontains=term) |
-                Q(tags__icontains=term)
-            )
+            term_query = ~SearchQuery(term, config='english')
+            text_query = term_query if text_query is None else text_query & term_query
+
+        search_q = Q()
+        if text_query is not None:
+            search_q &= Q(search_vector=text_query)
 
         # Field-specific searches
         for field, values in parsed_query['fields'].items():
@@ -232,6 +248,8 @@ class SearchService:
             for value in values:
                 if field == 'category':
                     field_q |= Q(category__name__icontains=value)
+                elif field == 'tags':
+                    field_q |= Q(tags_text__icontains=value)
                 else:
                     field_q |= Q(**{f'{field}__icontains': value})
             search_q &= field_q
@@ -244,34 +262,24 @@ class SearchService:
                 Q(content__icontains=phrase)
             )
 
-        queryset = queryset.filter(search_q).distinct()
+        queryset = queryset.filter(search_q)
 
         # Annotate with relevance scores
-        queryset = self._annotate_relevance(queryset, parsed_query)
-
-        # Order by relevance and usage
-        queryset = queryset.order_by('-relevance_score', '-usage_count', '-created_at')
-
-        results = []
-        for prompt in queryset[:self.max_results * 2]:  # Get more for post-processing
-            results.append({
-                'id': str(prompt.id),
-                'title': prompt.title,
-                'description': prompt.description or '',
-                'content': prompt.content[:500] + '...' if len(prompt.content) > 500 else prompt.content,
-                'category': prompt.category.name if prompt.category else None,
-                'author': prompt.author.username,
-                'tags': prompt.tags,
-                'usage_count': prompt.usage_count,
-                'created_at': prompt.created_at.isoformat(),
-                'relevance_score': getattr(prompt, 'relevance_score', 0),
-                'match_snippets': self._generate_snippets(prompt, parsed_query)
-            })
-
-        return results
-
-    def _semantic_search(self, parsed_query: Dict, filters: Dict = None) -> List[Dict]:
-        """Perform semantic search using AI embeddings"""
+        queryset = self._annotate_relevance(queryset, text_query)
+
+        # Order by relevance and usage, keeping only the best-ranked prompt per title (case-insensitive)
+        ranking = [F('relevance_score').desc(), F('usage_count').desc(), F('created_at').desc()]
+        queryset = queryset.annotate(
+            title_rank=Window(RowNumber(), partition_by=Lower('title'), order_by=ranking)
+        ).filter(title_rank=1).order_by(*ranking)
+
+        return [
+            (prompt, getattr(prompt, 'relevance_score', 0))
+            for prompt in queryset[:self.max_results * 2]  # Get more for post-processing
+        ]
+
+    def _semantic_search(self, parsed_query: Dict, filters: Dict = None) -> List[Tuple[Prompt, float]]:
+        """Perform semantic search using AI embeddings, returning (prompt, similarity) hits"""
         try:
             # Get base query for semantic search
             base_query = ' '.join(parsed_query['must'] + parsed_query['should'] + parsed_query['phrases'])
@@ -287,84 +295,131 @@ class SearchService:
                 logger.warning("Semantic search failed, falling back to text search")
                 return self._text_search(parsed_query, filters)
 
-            # Get all prompts with their embeddings (simplified for demo)
-            queryset = Prompt.objects.select_related('category', 'author').filter(is_active=True)
+            queryset = Prompt.objects.for_search().filter(is_active=True)
 
             if filters:
                 if filters.get('category'):
                     queryset = queryset.filter(category_id=filters['category'])
 
-            results = []
-            for prompt in queryset:
-                # Generate embedding for prompt content (simplified)
-                prompt_text = f"{prompt.title} {prompt.description or ''} {prompt.content[:1000]}"
-                prompt_embedding = self._get_text_embedding(prompt_text)
-
-                if prompt_embedding is not None:
-                    # Calculate cosine similarity
-                    similarity = cosine_similarity(
-                        [query_embedding],
-                        [prompt_embedding]
-                    )[0][0]
-
-                    if similarity >= self.semantic_threshold:
-                        results.append({
-                            'id': str(prompt.id),
-                            'title': prompt.title,
-                            'description': prompt.description or '',
-                            'content': prompt.content[:500] + '...' if len(prompt.content) > 500 else prompt.content,
-                            'category': prompt.category.name if prompt.category else None,
-                            'author': prompt.author.username,
-                            'tags': prompt.tags,
-                            'usage_count': prompt.usage_count,
-                            'created_at': prompt.created_at.isoformat(),
-                            'relevance_score': float(similarity),
-                            'match_snippets': self._generate_snippets(prompt, parsed_query)
-                        })
-
-            # Sort by similarity score
-            results.sort(key=lambda x: x['relevance_score'], reverse=True)
-
-            return results[:self.max_results]
+            # Score every prompt from its stored embedding with a single matrix-vector product
+            prompt_ids, matrix = self._embedding_matrix(queryset, filters)
+            if not prompt_ids:
+                return []
+            scores = self._cosine_scores(matrix, query_embedding)
+
+            # Best matches first; the stable sort keeps row order among ties
+            matches = np.flatnonzero(scores >= self.semantic_threshold)
+            top = matches[np.argsort(-scores[matches], kind='stable')[:self.max_results]]
+
+            # Only the prompts being returned are loaded in full
+            prompts = queryset.in_bulk([prompt_ids[i] for i in top])
+            return [
+                (prompts[prompt_ids[i]], float(scores[i]))
+                for i in top
+                if prompt_ids[i] in prompts
+            ]
 
         except Exception as e:
             logger.error(f"Semantic search error: {e}")
             # Fallback to text search
             return self._text_search(parsed_query, filters)
 
-    def _get_text_embedding(self, text: str) -> Optional[List[float]]:
-        """Get text embedding using AI service"""
-        try:
-            # For demo purposes, create a simple hash-based embedding
-            # In production, this would use a real embedding model
-            import hashlib
-            hash_obj = hashlib.md5(text.encode('utf-8'))
-            hash_bytes = hash_obj.digest()
+    def _embedding_matrix(self, queryset, filters: Dict = None) -> Tuple[List[Any], np.ndarray]:
+        """Prompt ids and their stacked embeddings for queryset, cached until any prompt changes"""
+        generation = cache.get_or_set(EMBEDDING_MATRIX_GENERATION_KEY, lambda: uuid.uuid4().hex, None)
+        category = (filters or {}).get('category') or 'all'
+        cache_key = f"search:embeddings:{EMBEDDING_MODEL}:{generation}:{category}"
+
+        cached = cache.get(cache_key)
+        if cached is not None:
+            prompt_ids, matrix_bytes = cached
+            return prompt_ids, np.frombuffer(matrix_bytes, dtype=EMBEDDING_DTYPE).reshape(len(prompt_ids), -1)
+
+        self._backfill_embeddings(queryset)
+        rows = list(
+            PromptEmbedding.objects.filter(
+                prompt__in=queryset,
+                model=EMBEDDING_MODEL
+            ).values_list('prompt_id', 'vector')
+        )
+        prompt_ids = [prompt_id for prompt_id, _ in rows]
+        matrix = stack_embeddings(vector for _, vector in rows)
+
+        # Raw bytes pickle far smaller and faster than the ndarray itself
+        cache.set(cache_key, (prompt_ids, matrix.tobytes()), self.embedding_cache_timeout)
+        return prompt_ids, matrix
+
+    def _backfill_embeddings(self, queryset, chunk_size: int = 1000):
+        """Store current embeddings for prompts that have none, or one from an older EMBEDDING_MODEL"""
+        # Stream just the embedded columns rather than hydrating Prompt instances
+        rows = queryset.exclude(embedding__model=EMBEDDING_MODEL).values_list(
+            'id', 'title', 'description', 'content'
+        ).iterator(chunk_size=chunk_size)
+
+        batch = []
+        for prompt_id, title, description, content in rows:
+            vector = text_embedding(embedding_text(title, description, content)).tobytes()
+            batch.append(PromptEmbedding(prompt_id=prompt_id, vector=vector, model=EMBEDDING_MODEL))
+            if len(batch) >= chunk_size:
+                self._upsert_embeddings(batch)
+                batch = []
+        if batch:
+            self._upsert_embeddings(batch)
+
+    @staticmethod
+    def _upsert_embeddings(embeddings: List[PromptEmbedding]):
+        PromptEmbedding.objects.bulk_create(
+            embeddings,
+            update_conflicts=True,
+            unique_fields=['prompt'],
+            update_fields=['vector', 'model', 'updated_at']
+        )
 
-            # Convert to simple vector representation
-            embedding = [b / 255.0 for b in hash_bytes[:50]]  # Use first 50 bytes as 50-dim vector
+    @staticmethod
+    def _content_preview(prompt) -> str:
+        """The first 500 characters of content from the for_search() annotations, with an ellipsis if cut"""
+        limit = PromptQuerySet.CONTENT_PREVIEW_LENGTH
+        preview = prompt.content_preview[:limit]
+        return preview + '...' if prompt.content_length > limit else preview
 
-            return embedding
+    def _serialize_result(self, prompt, relevance_score: float, parsed_query: Dict) -> Dict[str, Any]:
+        """Build the result dict returned for a matching prompt"""
+        return {
+            'id': str(prompt.id),
+            'title': prompt.title,
+            'description': prompt.description or '',
+            'content': self._content_preview(prompt),
+            'category': prompt.category.name if prompt.category else None,
+            'author': prompt.author.username,
+            'tags': prompt.tags,
+            'usage_count': prompt.usage_count,
+            'created_at': prompt.created_at.isoformat(),
+            'relevance_score': relevance_score,
+            'match_snippets': self._generate_snippets(prompt, parsed_query)
+        }
+
+    @staticmethod
+    def _cosine_scores(matrix: np.ndarray, query_embedding: np.ndarray) -> np.ndarray:
+        """Cosine similarity of each row of matrix to the query; zero vectors score 0"""
+        query = np.asarray(query_embedding, dtype=np.float32)
+        norms = np.linalg.norm(matrix, axis=1) * np.linalg.norm(query)
+        return (matrix @ query) / np.where(norms == 0, 1, norms)
+
+    def _get_text_embedding(self, text: str) -> Optional[np.ndarray]:
+        """Get text embedding using AI service"""
+        try:
+            return text_embedding(text)
 
         except Exception as e:
             logger.error(f"Error generating embedding: {e}")
             return None
 
-    def _annotate_relevance(self, queryset, parsed_query: Dict):
+    def _annotate_relevance(self, queryset, text_query: Optional[SearchQuery]):
         """Add relevance scoring to queryset"""
-        # Simple relevance scoring based on field matches
-        annotations = {}
-
-        for term in parsed_query['must'] + parsed_query['should']:
-            term_lower = term.lower()
-            annotations[f'title_score_{hash(term_lower)}'] = Value(
-                3 if term_lower in queryset.model._meta.get_field('title').value_from_object else 0,
-                output_field=FloatField()
-            )
-
-        # For demo, just return queryset as-is
-        # In production, this would use more sophisticated scoring
-        return queryset
+        if text_query is None:
+            return queryset.annotate(relevance_score=Value(0.0, output_field=FloatField()))
+        # Weighted ts_rank: title matches count most, then tags/description, then content
+        return queryset.annotate(relevance_score=SearchRank(F('search_vector'), text_query))
 
     def _generate_snippets(self, prompt, parsed_query: Dict) -> Dict[str, str]:
         """Generate highlighted snippets for search results"""
@@ -372,8 +427,9 @@ class SearchService:
 
         search_terms = parsed_query['must'] + parsed_query['should'] + parsed_query['phrases']
 
-        for field in ['title', 'description', 'content']:
-            text = getattr(prompt, field, '')
+        # The preview covers every character a 200-char snippet can show, so content itself isn't loaded
+        for field, attr in (('title', 'title'), ('description', 'description'), ('content', 'content_preview')):
+            text = getattr(prompt, attr, '')
             if text:
                 snippet = self._highlight_text(text, search_terms)
                 snippets[field] = snippet
@@ -385,12 +441,8 @@ class SearchService:
         if not text or not terms:
             return text[:max_length] + '...' if len(text) > max_length else text
 
-        highlighted = text
-
-        for term in terms:
-            if len(term) > 2:  # Only highlight terms longer than 2 chars
-                pattern = re.compile(re.escape(term), re.IGNORECASE)
-                highlighted = pattern.sub(f'<mark>{term}</mark>', highlighted)
+        pattern = _highlight_pattern(tuple(terms))
+        highlighted = pattern.sub(r'<mark>\g<0></mark>', text) if pattern else text
 
         # Truncate if too long
         if len(highlighted) > max_length:
@@ -407,37 +459,29 @@ class SearchService:
 
         return highlighted
 
-    def _post_process_results(self, results: List[Dict], query: str) -> List[Dict]:
-        """Post-process search results"""
+    def _post_process_results(self, hits: List[Tuple[Prompt, float]], query: str) -> List[Tuple[Prompt, float]]:
+        """Post-process search hits"""
         # Remove duplicates based on title similarity
-        unique_results = []
+        unique_hits = []
         seen_titles = set()
 
-        for result in results:
-            title_lower = result['title'].lower()
+        for prompt, score in hits:
+            title_lower = prompt.title.lower()
             if title_lower not in seen_titles:
                 seen_titles.add(title_lower)
-                unique_results.append(result)
+                unique_hits.append((prompt, score))
 
-        return unique_results
+        return unique_hits
 
     def _generate_suggestions(self, query: str, results: List[Dict]) -> List[str]:
         """Generate search suggestions based on results"""
         suggestions = []
 
-        # Extract tags from results
-        all_tags = []
-        for result in results:
-            all_tags.extend(result.get('tags', []))
-
-        # Get unique tags and sort by frequency
-        tag_counts = {}
-        for tag in all_tags:
-            tag_counts[tag] = tag_counts.get(tag, 0) + 1
+        # Count tags across results; most_common breaks ties by first appearance, like a stable sort
+        tag_counts = Counter(tag for result in results for tag in result.get('tags', []))
 
         # Suggest top tags
-        top_tags = sorted(tag_counts.items(), key=lambda x: x[1], reverse=True)[:5]
-        suggestions.extend([f'Add tag: "{tag}"' for tag, count in top_tags])
+        suggestions.extend([f'Add tag: "{tag}"' for tag, count in tag_counts.most_common(5)])
 
         # Suggest related searches
         if len(results) > 0:
@@ -449,29 +493,28 @@ class SearchService:
 
     def _generate_cache_key(self, query: str, filters: Dict, semantic: bool) -> str:
         """Generate cache key for search results"""
-        key_data = {
-            'query': query.lower().strip(),
-            'filters': filters or {},
-            'semantic': semantic,
-            'version': '1.0'  # Cache invalidation version
-        }
-
-        key_string = json.dumps(key_data, sort_keys=True)
-        cache_key = f"search_{hashlib.md5(key_string.encode()).hexdigest()}"
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update(query.lower().strip().encode('utf-8'))
+        digest.update(b'\x00')
+        # Sorted keys give equal filter dicts the same bytes, however deeply nested
+        digest.update(orjson.dumps(filters or {}, option=orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS))
+        digest.update(b'\x01' if semantic else b'\x00')
 
-        return cache_key
+        # The generation changes on clear_cache(), orphaning every earlier entry at once
+        generation = cache.get_or_set(SEARCH_CACHE_GENERATION_KEY, lambda: uuid.uuid4().hex, None)
+        return f"search_{generation}_{digest.hexdigest()}"
 
     def clear_cache(self, query: str = None):
         """Clear search cache"""
         if query:
             # Clear specific query cache
-            cache_key = self._generate_cache_key(query, {}, False)
-            cache.delete(cache_key)
-            cache_key = self._generate_cache_key(query, {}, True)
-            cache.delete(cache_key)
+            cache.delete_many([
+                self._generate_cache_key(query, {}, False),
+                self._generate_cache_key(query, {}, True),
+            ])
         else:
-            # Clear all search cache (use with caution)
-            cache.delete_pattern('search_*')
+            # Clear all search cache; stale entries expire on their own timeout
+            cache.set(SEARCH_CACHE_GENERATION_KEY, uuid.uuid4().hex, None)
 
     def get_search_analytics(self) -> Dict[str, Any]:
         """Get search analytics data"""
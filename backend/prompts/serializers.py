@@ -1,8 +1,21 @@
+from django.db import transaction
+from django.db.models import F
 from rest_framework import serializers
 from .models import Category, Prompt, PromptVersion, GuardrailsConfig, GuardrailsLog
 from django.contrib.auth.models import User
 
 
+class TagListField(serializers.ListField):
+    """Prompt tags; stored values are already lists of str, so rendering skips the per-item child pass"""
+
+    def __init__(self, **kwargs):
+        kwargs.setdefault('child', serializers.CharField(max_length=50))
+        super().__init__(**kwargs)
+
+    def to_representation(self, data):
+        return list(data)
+
+
 class CategorySerializer(serializers.ModelSerializer):
     """Serializer for Category model"""
 
@@ -14,22 +27,24 @@ class CategorySerializer(serializers.ModelSerializer):
 
 class CategoryListSerializer(serializers.ModelSerializer):
     """Simplified serializer for category lists"""
-    prompt_count = serializers.SerializerMethodField()
+    # Columns the list renders; views narrow their querysets to these
+    only_fields = ('id', 'name', 'description', 'created_at')
+
+    # Annotated by CategoryViewSet.get_queryset()
+    prompt_count = serializers.IntegerField(source='active_prompt_count', read_only=True, default=0)
 
     class Meta:
         model = Category
         fields = ['id', 'name', 'description', 'prompt_count', 'created_at']
 
-    def get_prompt_count(self, obj):
-        return obj.prompts.filter(is_active=True).count()
-
 
 class PromptSerializer(serializers.ModelSerializer):
     """Serializer for Prompt model"""
     category_name = serializers.CharField(source='category.name', read_only=True)
     author_name = serializers.CharField(source='author.username', read_only=True)
-    tags = serializers.JSONField()
-    version_count = serializers.SerializerMethodField()
+    tags = TagListField()
+    # Annotated by PromptQuerySet.with_version_count()
+    version_count = serializers.IntegerField(source='version_count_annotated', read_only=True, default=0)
 
     class Meta:
         model = Prompt
@@ -41,9 +56,6 @@ class PromptSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ['id', 'author', 'usage_count', 'last_used_at', 'created_at', 'updated_at', 'current_version', 'version_count']
 
-    def get_version_count(self, obj):
-        return obj.versions.count()
-
     def create(self, validated_data):
         validated_data['author'] = self.context['request'].user
         return super().create(validated_data)
@@ -51,8 +63,12 @@ class PromptSerializer(serializers.ModelSerializer):
 
 class PromptVersionSerializer(serializers.ModelSerializer):
     """Serializer for PromptVersion model"""
+    # Relations read through source= lookups; views select_related these
+    select_related_fields = ('category', 'author')
+
     category_name = serializers.CharField(source='category.name', read_only=True)
     author_name = serializers.CharField(source='author.username', read_only=True)
+    tags = TagListField(required=False)
 
     class Meta:
         model = PromptVersion
@@ -68,7 +84,9 @@ class PromptListSerializer(serializers.ModelSerializer):
     """Simplified serializer for prompt lists"""
     category_name = serializers.CharField(source='category.name', read_only=True)
     author_name = serializers.CharField(source='author.username', read_only=True)
-    version_count = serializers.SerializerMethodField()
+    # Annotated by PromptQuerySet.with_version_count()
+    version_count = serializers.IntegerField(source='version_count_annotated', read_only=True, default=0)
+    tags = TagListField(read_only=True)
 
     class Meta:
         model = Prompt
@@ -78,9 +96,6 @@ class PromptListSerializer(serializers.ModelSerializer):
             'version_count', 'created_at', 'updated_at'
         ]
 
-    def get_version_count(self, obj):
-        return obj.versions.count()
-
 
 class PromptCreateSerializer(serializers.ModelSerializer):
     """Serializer for creating prompts"""
@@ -95,49 +110,73 @@ class PromptCreateSerializer(serializers.ModelSerializer):
 
 
 class PromptUpdateSerializer(serializers.ModelSerializer):
-    """Serializer for updating prompts"""
-    create_version = serializers.BooleanField(default=True, write_only=True)
-    change_summary = serializers.CharField(write_only=True, required=False, allow_blank=True)
+    """Serializer for updating prompts
+
+    Also reads create_version (default true) and change_summary from the request body;
+    they steer versioning and are not model fields, so validate() checks them by hand.
+    """
 
     class Meta:
         model = Prompt
-        fields = ['title', 'description', 'content', 'category', 'tags', 'is_favorite', 'create_version', 'change_summary']
+        fields = ['title', 'description', 'content', 'category', 'tags', 'is_favorite']
+
+    def validate(self, attrs):
+        data = self.initial_data
+        try:
+            self._create_version = serializers.BooleanField().to_internal_value(data.get('create_version', True))
+        except serializers.ValidationError as e:
+            raise serializers.ValidationError({'create_version': e.detail})
+        change_summary = data.get('change_summary')
+        if change_summary is not None and not isinstance(change_summary, str):
+            raise serializers.ValidationError({'change_summary': 'Not a valid string.'})
+        self._change_summary = change_summary or ''
+        return attrs
 
     def update(self, instance, validated_data):
-        create_version = validated_data.pop('create_version', True)
-        change_summary = validated_data.pop('change_summary', '')
-
-        # Check if user can update this prompt
-        if instance.author != self.context['request'].user and not self.context['request'].user.is_staff:
-            raise serializers.ValidationError("You can only update your own prompts.")
+        create_version = self._create_version
+        change_summary = self._change_summary
 
         # Create a new version if requested and content changed
-        if create_version and self._has_content_changed(instance, validated_data):
+        if not (create_version and self._has_content_changed(instance, validated_data)):
+            return super().update(instance, validated_data)
+
+        # Snapshot and bump together; F() keeps concurrent updates from losing an increment
+        with transaction.atomic():
             PromptVersion.objects.create(
                 prompt=instance,
                 title=instance.title,
                 description=instance.description,
                 content=instance.content,
-                category=instance.category,
+                category_id=instance.category_id,
                 tags=instance.tags,
-                author=instance.author,
+                author_id=instance.author_id,
                 change_summary=change_summary or "Updated prompt content"
             )
-            instance.current_version += 1
-
-        return super().update(instance, validated_data)
+            instance.current_version = F('current_version') + 1
+            instance = super().update(instance, validated_data)
+        instance.refresh_from_db(fields=['current_version'])
+        return instance
 
     def _has_content_changed(self, instance, validated_data):
         """Check if the main content fields have changed"""
-        fields_to_check = ['title', 'description', 'content', 'category', 'tags']
-        return any(
-            str(validated_data.get(field, getattr(instance, field))) != str(getattr(instance, field))
-            for field in fields_to_check
-        )
+        # Only fields the client sent can differ; a PATCH of is_favorite alone compares nothing
+        for field in ('title', 'description', 'content', 'category', 'tags'):
+            if field not in validated_data:
+                continue
+            new = validated_data[field]
+            if field == 'category':
+                # Compare keys so the current category is never fetched
+                if getattr(new, 'pk', new) != instance.category_id:
+                    return True
+            elif new != getattr(instance, field):
+                return True
+        return False
 
 
 class GuardrailsConfigSerializer(serializers.ModelSerializer):
     """Serializer for GuardrailsConfig model"""
+    select_related_fields = ('created_by',)
+
     created_by_name = serializers.CharField(source='created_by.username', read_only=True)
     yaml_config = serializers.SerializerMethodField()
 
@@ -151,9 +190,13 @@ class GuardrailsConfigSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'created_by', 'created_at', 'updated_at']
 
     def get_yaml_config(self, obj):
-        """Convert JSON config to YAML format"""
-        import yaml
-        return yaml.dump(obj.configuration, default_flow_style=False)
+        """Convert JSON config to YAML format; rendered on retrieve or when ?include=yaml is passed"""
+        request = self.context.get('request')
+        view = self.context.get('view')
+        requested = request is not None and 'yaml' in request.query_params.get('include', '').split(',')
+        if not requested and getattr(view, 'action', None) != 'retrieve':
+            return None
+        return obj.get_yaml_config()
 
     def create(self, validated_data):
         validated_data['created_by'] = self.context['request'].user
@@ -162,6 +205,16 @@ class GuardrailsConfigSerializer(serializers.ModelSerializer):
 
 class GuardrailsLogSerializer(serializers.ModelSerializer):
     """Serializer for GuardrailsLog model"""
+    select_related_fields = ('user', 'prompt')
+    # Output field -> values() lookup, for list endpoints that render rows without model instances
+    values_fields = {
+        'id': 'id', 'user': 'user_id', 'user_name': 'user__username',
+        'action_type': 'action_type', 'log_level': 'log_level', 'message': 'message',
+        'details': 'details', 'prompt': 'prompt_id', 'prompt_title': 'prompt__title',
+        'ip_address': 'ip_address', 'user_agent': 'user_agent', 'allowed': 'allowed',
+        'risk_level': 'risk_level', 'timestamp': 'timestamp',
+    }
+
     user_name = serializers.CharField(source='user.username', read_only=True)
     prompt_title = serializers.CharField(source='prompt.title', read_only=True)
 
@@ -177,6 +230,13 @@ class GuardrailsLogSerializer(serializers.ModelSerializer):
 
 class GuardrailsConfigListSerializer(serializers.ModelSerializer):
     """Simplified serializer for guardrails config lists"""
+    select_related_fields = ('created_by',)
+    # Leaves out the configuration blob; created_by__id keeps the FK loaded for the join
+    only_fields = (
+        'id', 'name', 'description', 'config_type', 'is_active', 'created_at',
+        'created_by__id', 'created_by__username',
+    )
+
     created_by_name = serializers.CharField(source='created_by.username', read_only=True)
 
     class Meta:
@@ -2,9 +2,14 @@
 Services module for prompts app
 """
 
-from .ai_service import OllamaService
-from .guardrails_service import NemoGuardrailsService
+from .ai_service import get_ollama_service
+from .guardrails_service import get_guardrails_service
 
-# Create service instances
-ollama_service = OllamaService()
-nemo_guardrails_service = NemoGuardrailsService()
+
+def __getattr__(name):
+    # Service instances are created on first access rather than at import
+    if name == 'ollama_service':
+        return get_ollama_service()
+    if name == 'nemo_guardrails_service':
+        return get_guardrails_service()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
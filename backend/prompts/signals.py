@@ -0,0 +1,56 @@
+"""
+Signal handlers for the prompts app
+"""
+
+import uuid
+
+from django.core.cache import cache
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .embeddings import (
+    EMBEDDED_FIELDS, EMBEDDING_MATRIX_GENERATION_KEY, EMBEDDING_MODEL, prompt_embedding_bytes
+)
+from .managers import PromptQuerySet
+from .models import Category, Prompt, PromptEmbedding
+
+CATEGORY_LIST_CACHE_TIMEOUT = 3600  # 1 hour
+CATEGORY_LIST_VERSION_KEY = 'categories:list:version'
+
+
+def category_list_cache_key(path):
+    """Get the cache key for a category list response at the given request path"""
+    version = cache.get_or_set(CATEGORY_LIST_VERSION_KEY, lambda: uuid.uuid4().hex, None)
+    return f"categories:list:{version}:{path}"
+
+
+@receiver([post_save, post_delete], sender=Category)
+@receiver([post_save, post_delete], sender=Prompt)
+def invalidate_category_list_cache(sender, **kwargs):
+    """Drop cached category lists; they embed per-category prompt counts"""
+    cache.set(CATEGORY_LIST_VERSION_KEY, uuid.uuid4().hex, None)
+
+
+@receiver(post_save, sender=Prompt)
+def refresh_prompt_embedding(sender, instance, update_fields=None, **kwargs):
+    """Recompute the stored embedding when a prompt's text changes"""
+    if update_fields is not None and not EMBEDDED_FIELDS.intersection(update_fields):
+        return
+    PromptEmbedding.objects.update_or_create(
+        prompt=instance,
+        defaults={'vector': prompt_embedding_bytes(instance), 'model': EMBEDDING_MODEL}
+    )
+
+
+@receiver(post_save, sender=Prompt)
+def refresh_prompt_search_vector(sender, instance, update_fields=None, **kwargs):
+    """Recompute the full-text search vector when a prompt's searchable text changes"""
+    if update_fields is not None and not PromptQuerySet.SEARCH_VECTOR_FIELDS.intersection(update_fields):
+        return
+    Prompt.objects.filter(pk=instance.pk).update_search_vectors()
+
+
+@receiver([post_save, post_delete], sender=Prompt)
+def invalidate_embedding_matrix_cache(sender, **kwargs):
+    """Drop cached search embedding matrices; saves can change a prompt's vector, activity or category"""
+    cache.set(EMBEDDING_MATRIX_GENERATION_KEY, uuid.uuid4().hex, None)
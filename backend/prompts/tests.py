@@ -0,0 +1,41 @@
+import re
+import unittest
+
+from django.test import SimpleTestCase
+
+from .guardrails_service import _fuse
+
+try:
+    import re2
+except ImportError:
+    re2 = None
+
+
+class KeywordBoundaryTests(SimpleTestCase):
+    """Keyword scans must give the same verdicts with and without google-re2"""
+
+    CASES = [
+        ('killing time', True),
+        ('new skills', False),
+        ('kill', True),
+        ('x-kill', True),
+        # ASCII word boundaries: a non-ASCII letter doesn't extend the word
+        ('ékill', True),
+        ('naïve kill', True),
+        ('kill_switch', True),
+        ('_kill', False),
+        ('3kill', False),
+    ]
+
+    def assert_verdicts(self, engine):
+        pattern = _fuse(['kill'], engine)
+        for text, expected in self.CASES:
+            with self.subTest(text=text):
+                self.assertEqual(bool(pattern.search(text)), expected)
+
+    def test_re(self):
+        self.assert_verdicts(re)
+
+    @unittest.skipIf(re2 is None, 'google-re2 is not installed')
+    def test_re2(self):
+        self.assert_verdicts(re2)
@@ -3,8 +3,24 @@ Custom password validator for enhanced security
 """
 
 from django.core.exceptions import ValidationError
-from django.utils.translation import gettext as _
+from django.utils.translation import gettext_lazy
 import re
+import string
+
+UPPERCASE = frozenset(string.ascii_uppercase)
+LOWERCASE = frozenset(string.ascii_lowercase)
+DIGITS = frozenset(string.digits)
+SPECIAL_CHARACTERS = frozenset('!@#$%^&*()_+-=[]{};\':"\\|,.<>?')
+
+COMMON_PATTERN_RE = re.compile(r'123|abc|qwerty|password|admin|user')
+REPEATED_CHARACTER_RE = re.compile(r'(.)\1{2,}')
+
+# Translated when rendered, in the active locale
+HELP_TEXT = gettext_lazy(
+    "Your password must be at least 12 characters long and contain "
+    "uppercase letters, lowercase letters, numbers, and special characters. "
+    "It must not contain common patterns or repeated characters."
+)
 
 
 class CustomPasswordValidator:
@@ -19,36 +35,35 @@ class CustomPasswordValidator:
         if len(password) < 12:
             errors.append("Password must be at least 12 characters long.")
 
+        # Character class checks against the set of distinct characters, built in one pass
+        chars = set(password)
+
         # Check for uppercase letters
-        if not re.search(r'[A-Z]', password):
+        if chars.isdisjoint(UPPERCASE):
             errors.append("Password must contain at least one uppercase letter.")
 
         # Check for lowercase letters
-        if not re.search(r'[a-z]', password):
+        if chars.isdisjoint(LOWERCASE):
             errors.append("Password must contain at least one lowercase letter.")
 
         # Check for numbers
-        if not re.search(r'[0-9]', password):
+        if chars.isdisjoint(DIGITS):
             errors.append("Password must contain at least one number.")
 
         # Check for special characters
-        if not re.search(r'[!@#$%^&*()_+\-=\[\]{};\':"\\|,.<>?]', password):
+        if chars.isdisjoint(SPECIAL_CHARACTERS):
             errors.append("Password must contain at least one special character.")
 
         # Check for common patterns
-        if re.search(r'(123|abc|qwerty|password|admin|user)', password.lower()):
+        if COMMON_PATTERN_RE.search(password.lower()):
             errors.append("Password must not contain common patterns or words.")
 
         # Check for repeated characters
-        if re.search(r'(.)\1{2,}', password):
+        if REPEATED_CHARACTER_RE.search(password):
             errors.append("Password must not contain repeated characters (3 or more).")
 
         if errors:
             raise ValidationError(errors)
 
     def get_help_text(self):
-        return _(
-            "Your password must be at least 12 characters long and contain "
-            "uppercase letters, lowercase letters, numbers, and special characters. "
-            "It must not contain common patterns or repeated characters."
-        )
+        return HELP_TEXT
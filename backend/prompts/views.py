@@ -5,10 +5,13 @@ from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.filters import SearchFilter, OrderingFilter
 from django_filters.rest_framework import DjangoFilterBackend
-from django.db.models import Q, Count, Sum
-import asyncio
+from django.db import transaction
+from django.db.models import F, Q, Count, Sum
+from django.db.models.functions import Coalesce
+from django.core.cache import cache
+from django.utils.functional import cached_property
 from asgiref.sync import sync_to_async
-from .models import Category, Prompt, PromptVersion, AuditLog
+from .models import Category, Prompt, PromptVersion, AuditLog, GuardrailsConfig, GuardrailsLog
 from .serializers import (
     CategorySerializer, CategoryListSerializer,
     PromptSerializer, PromptListSerializer, PromptVersionSerializer,
@@ -16,7 +19,30 @@ from .serializers import (
     GuardrailsConfigSerializer, GuardrailsConfigListSerializer,
     GuardrailsLogSerializer
 )
+from .event_loop import run_sync
+from .filters import PromptFilter
+from .managers import approximate_count
+from .pagination import AuditLogCursorPagination, CachedCountPagination
+from .permissions import IsAuthorOrStaff
+from .signals import category_list_cache_key, CATEGORY_LIST_CACHE_TIMEOUT
 from .search_service import search_service
+from . import services
+
+
+class ClientInfoMixin:
+    """Client details for audit entries, read from the request once per view instance"""
+
+    @cached_property
+    def client_ip(self):
+        """Get the client IP address from the request"""
+        x_forwarded_for = self.request.META.get('HTTP_X_FORWARDED_FOR')
+        if x_forwarded_for:
+            return x_forwarded_for.split(',')[0]
+        return self.request.META.get('REMOTE_ADDR')
+
+    @cached_property
+    def user_agent(self):
+        return self.request.META.get('HTTP_USER_AGENT', '')
 
 
 class CategoryViewSet(viewsets.ModelViewSet):
@@ -29,26 +55,47 @@ class CategoryViewSet(viewsets.ModelViewSet):
     ordering_fields = ['name', 'created_at']
     ordering = ['name']
 
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action == 'list':
+            # One grouped COUNT for the page instead of one per category
+            queryset = queryset.only(*CategoryListSerializer.only_fields).annotate(
+                active_prompt_count=Count('prompts', filter=Q(prompts__is_active=True))
+            )
+        return queryset
+
     def get_serializer_class(self):
         if self.action == 'list':
             return CategoryListSerializer
         return CategorySerializer
 
+    def list(self, request, *args, **kwargs):
+        """List categories, served from cache until a category or prompt changes"""
+        cache_key = category_list_cache_key(request.get_full_path())
+        data = cache.get(cache_key)
+
+        if data is None:
+            data = super().list(request, *args, **kwargs).data
+            cache.set(cache_key, data, CATEGORY_LIST_CACHE_TIMEOUT)
+
+        return Response(data)
+
     @action(detail=False, methods=['get'])
     def stats(self, request):
         """Get category statistics"""
-        stats = Category.objects.annotate(
+        stats = list(Category.objects.annotate(
             prompt_count=Count('prompts', filter=Q(prompts__is_active=True))
-        ).values('name', 'prompt_count')
+        ).values('name', 'prompt_count'))
 
         return Response({
-            'categories': list(stats),
-            'total_categories': Category.objects.count(),
+            'categories': stats,
+            # Every category is in stats already; uncategorized prompts still need their own count
+            'total_categories': len(stats),
             'total_prompts': Prompt.objects.filter(is_active=True).count()
         })
 
 
-class PromptViewSet(viewsets.ModelViewSet):
+class PromptViewSet(ClientInfoMixin, viewsets.ModelViewSet):
     """ViewSet for Prompt CRUD operations"""
     serializer_class = PromptSerializer
     permission_classes = [IsAuthenticated]
@@ -59,8 +106,21 @@ class PromptViewSet(viewsets.ModelViewSet):
     ordering_fields = ['title', 'created_at', 'updated_at', 'usage_count']
     ordering = ['-created_at']
 
+    # Query params the search action passes on to SearchService as filters
+    SEARCH_FILTER_PARAMS = (
+        'author', 'tags', 'min_usage', 'max_usage',
+        'date_from', 'date_to', 'category_name'
+    )
+    SEARCH_LIST_PARAMS = frozenset(['tags'])
+
     def get_queryset(self):
-        queryset = Prompt.objects.select_related('category', 'author').filter(is_active=True)
+        if self.action in ('list', 'favorites'):
+            queryset = Prompt.objects.for_list()
+        else:
+            queryset = Prompt.objects.with_related()
+        queryset = queryset.filter(is_active=True)
+        if self.action in ('list', 'favorites', 'retrieve', 'use'):
+            queryset = queryset.with_version_count()
 
         # Filter by user if not admin and not requesting all prompts
         request_all = self.request.query_params.get('all', '').lower() == 'true'
@@ -69,6 +129,13 @@ class PromptViewSet(viewsets.ModelViewSet):
 
         return queryset
 
+    def get_permissions(self):
+        permissions = super().get_permissions()
+        if self.action in ('update', 'partial_update'):
+            # Checked in get_object(), before the request body is validated
+            permissions.append(IsAuthorOrStaff())
+        return permissions
+
     def get_serializer_class(self):
         if self.action == 'list':
             return PromptListSerializer
@@ -92,8 +159,8 @@ class PromptViewSet(viewsets.ModelViewSet):
                 'category': prompt.category.name if prompt.category else None,
                 'tags': prompt.tags
             },
-            ip_address=self._get_client_ip(),
-            user_agent=self.request.META.get('HTTP_USER_AGENT', '')
+            ip_address=self.client_ip,
+            user_agent=self.user_agent
         )
 
     def perform_update(self, serializer):
@@ -110,8 +177,8 @@ class PromptViewSet(viewsets.ModelViewSet):
                 'category': prompt.category.name if prompt.category else None,
                 'tags': prompt.tags
             },
-            ip_address=self._get_client_ip(),
-            user_agent=self.request.META.get('HTTP_USER_AGENT', '')
+            ip_address=self.client_ip,
+            user_agent=self.user_agent
         )
 
     def perform_destroy(self, instance):
@@ -125,26 +192,17 @@ class PromptViewSet(viewsets.ModelViewSet):
                 'title': instance.title,
                 'category': instance.category.name if instance.category else None
             },
-            ip_address=self._get_client_ip(),
-            user_agent=self.request.META.get('HTTP_USER_AGENT', '')
+            ip_address=self.client_ip,
+            user_agent=self.user_agent
         )
 
         instance.delete()
 
-    def _get_client_ip(self):
-        """Get the client IP address from the request"""
-        x_forwarded_for = self.request.META.get('HTTP_X_FORWARDED_FOR')
-        if x_forwarded_for:
-            ip = x_forwarded_for.split(',')[0]
-        else:
-            ip = self.request.META.get('REMOTE_ADDR')
-        return ip
-
     @action(detail=True, methods=['get'])
     def versions(self, request, pk=None):
         """Get all versions of a prompt"""
         prompt = self.get_object()
-        versions = prompt.versions.all()
+        versions = prompt.versions.select_related(*PromptVersionSerializer.select_related_fields)
         serializer = PromptVersionSerializer(versions, many=True)
         return Response(serializer.data)
 
@@ -159,7 +217,9 @@ class PromptViewSet(viewsets.ModelViewSet):
 
         try:
             version_number = int(version_number)
-            version = prompt.versions.get(version_number=version_number)
+            version = prompt.versions.select_related(
+                *PromptVersionSerializer.select_related_fields
+            ).get(version_number=version_number)
             serializer = PromptVersionSerializer(version)
             return Response(serializer.data)
         except (ValueError, PromptVersion.DoesNotExist):
@@ -174,34 +234,41 @@ class PromptViewSet(viewsets.ModelViewSet):
         if not version_number:
             return Response({'error': 'Version number is required'}, status=status.HTTP_400_BAD_REQUEST)
 
+        # Check permissions
+        if prompt.author_id != request.user.id and not request.user.is_staff:
+            return Response({'error': 'You can only restore your own prompts'}, status=status.HTTP_403_FORBIDDEN)
+
         try:
             version_number = int(version_number)
-            version = prompt.versions.get(version_number=version_number)
-
-            # Check permissions
-            if prompt.author != request.user and not request.user.is_staff:
-                return Response({'error': 'You can only restore your own prompts'}, status=status.HTTP_403_FORBIDDEN)
-
-            # Create new version with current content
-            PromptVersion.objects.create(
-                prompt=prompt,
-                title=prompt.title,
-                description=prompt.description,
-                content=prompt.content,
-                category=prompt.category,
-                tags=prompt.tags,
-                author=prompt.author,
-                change_summary=f"Restored to version {version_number}"
-            )
+            version = prompt.versions.only(
+                'id', 'title', 'description', 'content', 'category_id', 'tags'
+            ).get(version_number=version_number)
+
+            with transaction.atomic():
+                # Create new version with current content
+                PromptVersion.objects.create(
+                    prompt=prompt,
+                    title=prompt.title,
+                    description=prompt.description,
+                    content=prompt.content,
+                    category_id=prompt.category_id,
+                    tags=prompt.tags,
+                    author_id=prompt.author_id,
+                    change_summary=f"Restored to version {version_number}"
+                )
 
-            # Update prompt to match the restored version
-            prompt.title = version.title
-            prompt.description = version.description
-            prompt.content = version.content
-            prompt.category = version.category
-            prompt.tags = version.tags
-            prompt.current_version += 1
-            prompt.save()
+                # Update prompt to match the restored version; save() keeps the signal-maintained
+                # search vector, embedding and caches in step with the restored content, and
+                # update_fields leaves usage and favorite state to their own atomic updates
+                prompt.title = version.title
+                prompt.description = version.description
+                prompt.content = version.content
+                prompt.category_id = version.category_id
+                prompt.tags = version.tags
+                prompt.current_version = F('current_version') + 1
+                prompt.save(update_fields=[
+                    'title', 'description', 'content', 'category', 'tags', 'current_version', 'updated_at'
+                ])
 
             return Response({'message': f'Prompt restored to version {version_number}'})
 
@@ -213,14 +280,13 @@ class PromptViewSet(viewsets.ModelViewSet):
         """Toggle favorite status of a prompt"""
         prompt = self.get_object()
 
-        if prompt.author != request.user and not request.user.is_staff:
+        if prompt.author_id != request.user.id and not request.user.is_staff:
             return Response(
                 {'error': 'You can only favorite your own prompts'},
                 status=status.HTTP_403_FORBIDDEN
             )
 
-        prompt.is_favorite = not prompt.is_favorite
-        prompt.save()
+        prompt.toggle_favorite()
         return Response({'is_favorite': prompt.is_favorite})
 
     @action(detail=True, methods=['post'])
@@ -253,26 +319,16 @@ class PromptViewSet(viewsets.ModelViewSet):
         sort_by = request.query_params.get('sort_by', 'relevance')
         semantic = request.query_params.get('semantic', '').lower() == 'true'
 
-        # Build filters dict
-        filters = {}
+        # Build filters dict from the non-empty filter params; tags may be repeated
+        params = request.query_params
+        filters = {
+            param: params.getlist(param) if param in self.SEARCH_LIST_PARAMS else params[param]
+            for param in self.SEARCH_FILTER_PARAMS
+            if params.get(param)
+        }
         if category_id:
             filters['category'] = category_id
 
-        # Additional filters from query params
-        filter_params = [
-            'author', 'tags', 'min_usage', 'max_usage',
-            'date_from', 'date_to', 'category_name'
-        ]
-
-        for param in filter_params:
-            value = request.query_params.get(param)
-            if value:
-                if param == 'tags':
-                    # Handle multiple tags
-                    filters['tags'] = request.query_params.getlist('tags')
-                else:
-                    filters[param] = value
-
         # Use the search service
         search_results = search_service.search(
             query=query,
@@ -291,17 +347,15 @@ class PromptViewSet(viewsets.ModelViewSet):
                 'filters': filters,
                 'results_count': search_results['total']
             },
-            ip_address=self._get_client_ip(),
-            user_agent=request.META.get('HTTP_USER_AGENT', '')
+            ip_address=self.client_ip,
+            user_agent=self.user_agent
         )
 
-        # Return paginated results if needed
+        # Results come back from the search service already serialized; page them as they are
         page = self.paginate_queryset(search_results['results'])
         if page is not None:
-            serializer = PromptListSerializer(page, many=True, context={'request': request})
-            return self.get_paginated_response(serializer.data)
+            return self.get_paginated_response(page)
 
-        serializer = PromptListSerializer(search_results['results'], many=True, context={'request': request})
         return Response(search_results)
 
     @action(detail=False, methods=['get'])
@@ -309,16 +363,23 @@ class PromptViewSet(viewsets.ModelViewSet):
         """Get prompt statistics"""
         queryset = self.get_queryset()
 
-        stats = {
-            'total_prompts': queryset.count(),
-            'favorite_prompts': queryset.filter(is_favorite=True).count(),
-            'total_usage': queryset.aggregate(total=Sum('usage_count'))['total'] or 0,
-            'by_category': queryset.values('category__name').annotate(
-                count=Count('id')
-            ).order_by('-count')
-        }
+        # One grouped scan; every prompt falls in exactly one group (uncategorized under None),
+        # so the totals are sums over the groups
+        groups = list(queryset.values('category__name').annotate(
+            count=Count('id'),
+            favorites=Count('id', filter=Q(is_favorite=True)),
+            usage=Coalesce(Sum('usage_count'), 0)
+        ).order_by('-count'))
 
-        return Response(stats)
+        return Response({
+            'total_prompts': sum(group['count'] for group in groups),
+            'favorite_prompts': sum(group['favorites'] for group in groups),
+            'total_usage': sum(group['usage'] for group in groups),
+            'by_category': [
+                {'category__name': group['category__name'], 'count': group['count']}
+                for group in groups
+            ]
+        })
 
     # AI-powered endpoints
     @action(detail=False, methods=['post'])
@@ -335,17 +396,14 @@ class PromptViewSet(viewsets.ModelViewSet):
             )
 
         try:
-            # Run async function in sync context
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
-            suggestions = loop.run_until_complete(
-                ollama_service.generate_prompt_suggestions(
+            # Run async function on the shared event loop
+            suggestions = run_sync(
+                services.ollama_service.generate_prompt_suggestions(
                     context=context,
                     suggestion_type=suggestion_type,
                     num_suggestions=num_suggestions
                 )
             )
-            loop.close()
 
             # Log AI suggestion generation
             AuditLog.log_user_action(
@@ -357,8 +415,8 @@ class PromptViewSet(viewsets.ModelViewSet):
                     'suggestion_type': suggestion_type,
                     'num_suggestions': num_suggestions
                 },
-                ip_address=self._get_client_ip(),
-                user_agent=request.META.get('HTTP_USER_AGENT', '')
+                ip_address=self.client_ip,
+                user_agent=self.user_agent
             )
 
             return Response({
@@ -387,17 +445,14 @@ class PromptViewSet(viewsets.ModelViewSet):
             )
 
         try:
-            # Run async function in sync context
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
-            result = loop.run_until_complete(
-                ollama_service.improve_prompt(
+            # Run async function on the shared event loop
+            result = run_sync(
+                services.ollama_service.improve_prompt(
                     current_prompt=current_prompt,
                     improvement_type=improvement_type,
                     context=context
                 )
             )
-            loop.close()
 
             if 'error' in result:
                 return Response(result, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
@@ -412,8 +467,8 @@ class PromptViewSet(viewsets.ModelViewSet):
                     'original_length': len(current_prompt),
                     'improved_length': len(result.get('improved_prompt', ''))
                 },
-                ip_address=self._get_client_ip(),
-                user_agent=request.META.get('HTTP_USER_AGENT', '')
+                ip_address=self.client_ip,
+                user_agent=self.user_agent
             )
 
             return Response(result)
@@ -436,13 +491,10 @@ class PromptViewSet(viewsets.ModelViewSet):
             )
 
         try:
-            # Run async function in sync context
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
-            result = loop.run_until_complete(
-                ollama_service.analyze_prompt_effectiveness(prompt_text)
+            # Run async function on the shared event loop
+            result = run_sync(
+                services.ollama_service.analyze_prompt_effectiveness(prompt_text)
             )
-            loop.close()
 
             if 'error' in result:
                 return Response(result, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
@@ -455,8 +507,8 @@ class PromptViewSet(viewsets.ModelViewSet):
                 details={
                     'prompt_length': len(prompt_text)
                 },
-                ip_address=self._get_client_ip(),
-                user_agent=request.META.get('HTTP_USER_AGENT', '')
+                ip_address=self.client_ip,
+                user_agent=self.user_agent
             )
 
             return Response(result)
@@ -470,13 +522,14 @@ class PromptViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=['get'])
     def ai_status(self, request):
         """Check the status of AI services"""
-        available = ollama_service.is_ollama_available()
-        models = ollama_service.get_available_models()
+        available = services.ollama_service.is_ollama_available()
+        # No point asking an unreachable server for its models
+        models = services.ollama_service.get_available_models() if available else []
 
         return Response({
             'ollama_available': available,
             'available_models': models,
-            'default_model': getattr(ollama_service, 'default_model', 'llama2')
+            'default_model': getattr(services.ollama_service, 'default_model', 'llama2')
         })
 
     @action(detail=False, methods=['post'])
@@ -492,13 +545,10 @@ class PromptViewSet(viewsets.ModelViewSet):
             )
 
         try:
-            # Run async function in sync context
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
-            result = loop.run_until_complete(
-                nemo_guardrails_service.validate_input(content)
+            # Run async function on the shared event loop
+            result = run_sync(
+                services.nemo_guardrails_service.validate_input(content)
             )
-            loop.close()
 
             # Log the validation
             GuardrailsLog.log_validation(
@@ -511,8 +561,8 @@ class PromptViewSet(viewsets.ModelViewSet):
                     'risk_level': result.get('risk_level', 'unknown'),
                     'violations': result.get('violations', [])
                 },
-                ip_address=self._get_client_ip(),
-                user_agent=request.META.get('HTTP_USER_AGENT', ''),
+                ip_address=self.client_ip,
+                user_agent=self.user_agent,
                 allowed=result.get('valid', True),
                 risk_level=result.get('risk_level', 'low')
             )
@@ -543,14 +593,15 @@ class PromptViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=['get'])
     def guardrails_status(self, request):
         """Get guardrails service status and configuration"""
-        status_info = nemo_guardrails_service.get_guardrails_status()
-        config = nemo_guardrails_service.get_guardrails_config()
+        status_info = services.nemo_guardrails_service.get_guardrails_status()
+        config = services.nemo_guardrails_service.get_guardrails_config()
 
         return Response({
             'service_status': status_info,
             'current_config': config,
             'active_configs': GuardrailsConfig.objects.filter(is_active=True).count(),
-            'total_logs': GuardrailsLog.objects.count()
+            # Planner estimate; an exact count scans the whole (large, append-only) log table
+            'total_logs': approximate_count(GuardrailsLog)
         })
 
     @action(detail=False, methods=['post'])
@@ -583,7 +634,7 @@ class PromptViewSet(viewsets.ModelViewSet):
             )
 
             # Update the service configuration
-            success = nemo_guardrails_service.update_guardrails_config(config)
+            success = services.nemo_guardrails_service.update_guardrails_config(config)
 
             if success:
                 # Activate this configuration
@@ -599,8 +650,9 @@ class PromptViewSet(viewsets.ModelViewSet):
                         'config_type': config_type,
                         'activated': True
                     },
-                    ip_address=self._get_client_ip(),
-                    user_agent=request.META.get('HTTP_USER_AGENT', '')
+                    ip_address=self.client_ip,
+                    user_agent=self.user_agent,
+                    immediate=True
                 )
 
                 return Response({
@@ -626,6 +678,7 @@ class AuditLogViewSet(viewsets.ReadOnlyModelViewSet):
     """ViewSet for viewing audit logs (admin only)"""
     serializer_class = None  # Will be set dynamically
     permission_classes = [IsAuthenticated]
+    pagination_class = CachedCountPagination
 
     def get_serializer_class(self):
         if self.action == 'list':
@@ -633,7 +686,7 @@ class AuditLogViewSet(viewsets.ReadOnlyModelViewSet):
         return GuardrailsLogSerializer
 
     def get_queryset(self):
-        queryset = GuardrailsLog.objects.select_related('user', 'prompt').all()
+        queryset = GuardrailsLog.objects.select_related(*self.get_serializer_class().select_related_fields)
 
         # Filter based on user permissions
         if not self.request.user.is_staff:
@@ -665,6 +718,23 @@ class AuditLogViewSet(viewsets.ReadOnlyModelViewSet):
 
         return queryset.order_by('-timestamp')
 
+    def list(self, request, *args, **kwargs):
+        return self._values_response(self.get_queryset())
+
+    @action(detail=False, methods=['get'], pagination_class=AuditLogCursorPagination)
+    def feed(self, request):
+        """The list with cursor pagination: next/previous links only, and deep pages cost the same as the first"""
+        return self._values_response(self.get_queryset())
+
+    def _values_response(self, queryset):
+        """Paginated log rows read with values(), skipping model instantiation"""
+        lookups = GuardrailsLogSerializer.values_fields
+        rows = queryset.values(*lookups.values())
+        # Always paginated: both the list and feed paginators have a page size
+        page = self.paginate_queryset(rows)
+        data = [{name: row[lookup] for name, lookup in lookups.items()} for row in page]
+        return self.get_paginated_response(data)
+
     @action(detail=False, methods=['get'])
     def statistics(self, request):
         """Get audit log statistics"""
@@ -713,16 +783,10 @@ class AuditLogViewSet(viewsets.ReadOnlyModelViewSet):
             Q(action_type__in=['jailbreak_attempt', 'content_violation', 'rate_limit'])
         )
 
-        page = self.paginate_queryset(security_events)
-        if page is not None:
-            serializer = GuardrailsLogSerializer(page, many=True, context={'request': request})
-            return self.get_paginated_response(serializer.data)
+        return self._values_response(security_events)
 
-        serializer = GuardrailsLogSerializer(security_events, many=True, context={'request': request})
-        return Response(serializer.data)
 
-
-class GuardrailsConfigViewSet(viewsets.ModelViewSet):
+class GuardrailsConfigViewSet(ClientInfoMixin, viewsets.ModelViewSet):
     """ViewSet for managing guardrails configurations (admin only)"""
     queryset = GuardrailsConfig.objects.all()
     serializer_class = GuardrailsConfigSerializer
@@ -734,7 +798,10 @@ class GuardrailsConfigViewSet(viewsets.ModelViewSet):
         return GuardrailsConfigSerializer
 
     def get_queryset(self):
-        queryset = GuardrailsConfig.objects.select_related('created_by').all()
+        serializer_class = self.get_serializer_class()
+        queryset = GuardrailsConfig.objects.select_related(*serializer_class.select_related_fields)
+        if self.action == 'list':
+            queryset = queryset.only(*serializer_class.only_fields)
 
         # Only staff can see all configs, others can only see active ones
         if not self.request.user.is_staff:
@@ -779,8 +846,9 @@ class GuardrailsConfigViewSet(viewsets.ModelViewSet):
                     'config_type': config.config_type,
                     'activated': True
                 },
-                ip_address=self._get_client_ip(),
-                user_agent=request.META.get('HTTP_USER_AGENT', '')
+                ip_address=self.client_ip,
+                user_agent=self.user_agent,
+                immediate=True
             )
 
             return Response({
@@ -0,0 +1,132 @@
+"""
+Background batched writers for append-only records such as audit logs
+"""
+
+import os
+import queue
+import threading
+import time
+import logging
+from typing import Dict, List
+
+from django.db import close_old_connections
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+
+class BufferedWriter:
+    """Queues unsaved model instances and bulk-inserts them from a daemon thread"""
+
+    def __init__(self, model, batch_size: int = 500, flush_interval: float = 0.1):
+        self.model = model
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._lock = threading.Lock()
+        self._queue: queue.Queue = queue.Queue()
+        self._thread = None
+        self._pid = None
+
+    def put(self, obj) -> None:
+        """Queue obj for insertion; never blocks the caller on the database"""
+        self._ensure_started()
+        self._queue.put_nowait(obj)
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """Write whatever is still queued and stop the writer thread"""
+        with self._lock:
+            if self._pid != os.getpid() or self._thread is None or not self._thread.is_alive():
+                return
+            self._queue.put_nowait(_STOP)
+            thread = self._thread
+        thread.join(timeout)
+
+    def _ensure_started(self) -> None:
+        pid = os.getpid()
+        if self._pid == pid and self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._pid == pid and self._thread is not None and self._thread.is_alive():
+                return
+            if self._pid != pid:
+                # Threads don't survive fork, and the parent's queue is the parent's to write
+                self._queue = queue.Queue()
+            self._pid = pid
+            self._thread = threading.Thread(
+                target=self._run,
+                name=f'{self.model._meta.label_lower}-writer',
+                daemon=True
+            )
+            self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            batch, stopping = self._next_batch()
+            if batch:
+                self._write(batch)
+            if stopping:
+                close_old_connections()
+                return
+
+    def _next_batch(self):
+        """Block for the first item, then gather more until the batch fills or the interval lapses"""
+        batch: List = []
+        item = self._queue.get()
+        if item is _STOP:
+            return batch, True
+        batch.append(item)
+
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item is _STOP:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    def _write(self, batch: List) -> None:
+        close_old_connections()
+        try:
+            self.model.objects.bulk_create(batch, batch_size=self.batch_size)
+        except Exception:
+            # One bad row (e.g. a dangling foreign key) fails the whole INSERT; retry row by row
+            # so only the offending records are dropped
+            self._write_each(batch)
+
+    def _write_each(self, batch: List) -> None:
+        failed = 0
+        for obj in batch:
+            try:
+                self.model.objects.bulk_create([obj])
+            except Exception:
+                # Losing a record must never take the writer thread down with it
+                failed += 1
+                logger.exception(f"Failed to write {self.model.__name__} record")
+        if failed:
+            logger.error(f"Dropped {failed} of {len(batch)} {self.model.__name__} records")
+
+
+_writers: Dict[type, BufferedWriter] = {}
+_writers_lock = threading.Lock()
+
+
+def get_writer(model) -> BufferedWriter:
+    """Return the shared BufferedWriter for model"""
+    writer = _writers.get(model)
+    if writer is None:
+        with _writers_lock:
+            writer = _writers.setdefault(model, BufferedWriter(model))
+    return writer
+
+
+def stop_writers() -> None:
+    """Flush and stop every writer; registered to run at process exit"""
+    for writer in list(_writers.values()):
+        writer.stop()
@@ -2,92 +2,59 @@
 Seed data script for Prompt Library
 Run this script to populate the database with sample data
 Usage: python manage.py shell < seed_data.py
+
+Environment:
+    SEED_BULK_BATCH_SIZE  rows per INSERT for the bulk inserts (default 100)
 """
 
 import os
 import django
 import json
 from datetime import datetime, timedelta
+from itertools import islice
 
 # Setup Django
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'prompt_library.settings')
 django.setup()
 
 from django.contrib.auth.models import User
+from django.db import transaction
 from prompts.models import Category, Prompt
 
-def create_sample_data():
-    """Create sample categories and prompts"""
-
-    # Create admin user if not exists
-    admin_user, created = User.objects.get_or_create(
-        username='admin',
-        defaults={
-            'email': 'admin@promptlibrary.com',
-            'is_staff': True,
-            'is_superuser': True
-        }
-    )
-    if created:
-        admin_user.set_password('admin123')
-        admin_user.save()
-        print(f"Created admin user: {admin_user.username}")
-
-    # Create regular user
-    regular_user, created = User.objects.get_or_create(
-        username='user',
-        defaults={
-            'email': 'user@promptlibrary.com',
-            'first_name': 'John',
-            'last_name': 'Doe'
-        }
-    )
-    if created:
-        regular_user.set_password('user123')
-        regular_user.save()
-        print(f"Created regular user: {regular_user.username}")
-
-    # Sample categories
-    categories_data = [
-        {
-            'name': 'Writing',
-            'description': 'Prompts for creative writing, copywriting, and content creation'
-        },
-        {
-            'name': 'Programming',
-            'description': 'Coding prompts, debugging help, and development assistance'
-        },
-        {
-            'name': 'Business',
-            'description': 'Business analysis, strategy, and professional communication'
-        },
-        {
-            'name': 'Education',
-            'description': 'Teaching, learning, and educational content creation'
-        },
-        {
-            'name': 'Creative',
-            'description': 'Art, design, music, and other creative endeavors'
-        }
-    ]
-
-    categories = {}
-    for cat_data in categories_data:
-        category, created = Category.objects.get_or_create(
-            name=cat_data['name'],
-            defaults={'description': cat_data['description']}
-        )
-        if created:
-            print(f"Created category: {category.name}")
-        categories[cat_data['name']] = category
-
-    # Sample prompts
-    prompts_data = [
-        # Writing prompts
-        {
-            'title': 'Email Marketing Copy',
-            'description': 'Write compelling email subject lines and body copy for a product launch',
-            'content': '''Create 5 different email subject lines for a new productivity app launch:
+BATCH_SIZE = int(os.environ.get('SEED_BULK_BATCH_SIZE', '100'))
+
+
+# Sample categories
+_CATEGORIES_DATA = (
+    {
+        'name': 'Writing',
+        'description': 'Prompts for creative writing, copywriting, and content creation'
+    },
+    {
+        'name': 'Programming',
+        'description': 'Coding prompts, debugging help, and development assistance'
+    },
+    {
+        'name': 'Business',
+        'description': 'Business analysis, strategy, and professional communication'
+    },
+    {
+        'name': 'Education',
+        'description': 'Teaching, learning, and educational content creation'
+    },
+    {
+        'name': 'Creative',
+        'description': 'Art, design, music, and other creative endeavors'
+    }
+)
+
+# Sample prompts, each naming its category
+_PROMPTS_DATA = (
+    # Writing prompts
+    {
+        'title': 'Email Marketing Copy',
+        'description': 'Write compelling email subject lines and body copy for a product launch',
+        'content': '''Create 5 different email subject lines for a new productivity app launch:
 1. Subject line that creates urgency
 2. Subject line that highlights a benefit
 3. Subject line that asks a question
@@ -100,14 +67,14 @@ Then write the email body copy that:
 - Includes social proof or testimonials
 - Has a clear call-to-action
 - Uses engaging, conversational language''',
-            'category': categories['Writing'],
-            'tags': ['email', 'marketing', 'copywriting', 'product-launch'],
-            'is_favorite': True
-        },
-        {
-            'title': 'Blog Post Outline',
-            'description': 'Create a comprehensive blog post outline for a given topic',
-            'content': '''Create a detailed blog post outline for the topic: "{topic}"
+        'category': 'Writing',
+        'tags': ['email', 'marketing', 'copywriting', 'product-launch'],
+        'is_favorite': True
+    },
+    {
+        'title': 'Blog Post Outline',
+        'description': 'Create a comprehensive blog post outline for a given topic',
+        'content': '''Create a detailed blog post outline for the topic: "{topic}"
 
 Structure the outline with:
 1. Introduction (hook, problem statement, thesis)
@@ -119,16 +86,16 @@ Structure the outline with:
 7. Recommended word count for each section
 
 Make it comprehensive but not overwhelming, suitable for a 1500-2000 word blog post.''',
-            'category': categories['Writing'],
-            'tags': ['blog', 'content', 'outline', 'seo'],
-            'is_favorite': False
-        },
+        'category': 'Writing',
+        'tags': ['blog', 'content', 'outline', 'seo'],
+        'is_favorite': False
+    },
 
-        # Programming prompts
-        {
-            'title': 'Code Review Checklist',
-            'description': 'Generate a comprehensive code review checklist for different types of projects',
-            'content': '''Create a code review checklist for {project_type} development:
+    # Programming prompts
+    {
+        'title': 'Code Review Checklist',
+        'description': 'Generate a comprehensive code review checklist for different types of projects',
+        'content': '''Create a code review checklist for {project_type} development:
 
 General Code Quality:
 - [ ] Code follows project style guidelines
@@ -154,14 +121,14 @@ Testing:
 - [ ] Integration tests included
 - [ ] Edge cases covered
 - [ ] Test coverage meets requirements''',
-            'category': categories['Programming'],
-            'tags': ['code-review', 'quality', 'checklist', 'development'],
-            'is_favorite': True
-        },
-        {
-            'title': 'API Documentation Template',
-            'description': 'Create comprehensive API documentation for REST endpoints',
-            'content': '''Document the following API endpoint:
+        'category': 'Programming',
+        'tags': ['code-review', 'quality', 'checklist', 'development'],
+        'is_favorite': True
+    },
+    {
+        'title': 'API Documentation Template',
+        'description': 'Create comprehensive API documentation for REST endpoints',
+        'content': '''Document the following API endpoint:
 
 Endpoint: {method} {path}
 Description: {description}
@@ -180,16 +147,16 @@ Authentication: Required/Permission levels
 Rate Limiting: Requests per minute/hour
 Examples: curl commands and response examples
 Notes: Additional considerations, deprecation warnings''',
-            'category': categories['Programming'],
-            'tags': ['api', 'documentation', 'rest', 'backend'],
-            'is_favorite': False
-        },
+        'category': 'Programming',
+        'tags': ['api', 'documentation', 'rest', 'backend'],
+        'is_favorite': False
+    },
 
-        # Business prompts
-        {
-            'title': 'Market Research Framework',
-            'description': 'Create a comprehensive market research framework for product analysis',
-            'content': '''Conduct market research for {product_category}:
+    # Business prompts
+    {
+        'title': 'Market Research Framework',
+        'description': 'Create a comprehensive market research framework for product analysis',
+        'content': '''Conduct market research for {product_category}:
 
 1. Market Size Analysis:
    - Total addressable market (TAM)
@@ -220,16 +187,16 @@ Notes: Additional considerations, deprecation warnings''',
    - Pricing recommendations
    - Marketing approach
    - Risk mitigation strategies''',
-            'category': categories['Business'],
-            'tags': ['market-research', 'analysis', 'strategy', 'business'],
-            'is_favorite': True
-        },
+        'category': 'Business',
+        'tags': ['market-research', 'analysis', 'strategy', 'business'],
+        'is_favorite': True
+    },
 
-        # Education prompts
-        {
-            'title': 'Lesson Plan Template',
-            'description': 'Create a detailed lesson plan for any subject and grade level',
-            'content': '''Create a lesson plan for:
+    # Education prompts
+    {
+        'title': 'Lesson Plan Template',
+        'description': 'Create a detailed lesson plan for any subject and grade level',
+        'content': '''Create a lesson plan for:
 
 Subject: {subject}
 Grade Level: {grade}
@@ -285,16 +252,16 @@ Extensions:
 - Enrichment activities
 - Cross-curricular connections
 - Real-world applications''',
-            'category': categories['Education'],
-            'tags': ['lesson-plan', 'education', 'teaching', 'curriculum'],
-            'is_favorite': False
-        },
+        'category': 'Education',
+        'tags': ['lesson-plan', 'education', 'teaching', 'curriculum'],
+        'is_favorite': False
+    },
 
-        # Creative prompts
-        {
-            'title': 'Story Character Development',
-            'description': 'Develop complex, realistic characters for stories',
-            'content': '''Develop a character profile for a {genre} story:
+    # Creative prompts
+    {
+        'title': 'Story Character Development',
+        'description': 'Develop complex, realistic characters for stories',
+        'content': '''Develop a character profile for a {genre} story:
 
 Character Name: {character_name}
 Role in Story: {role}
@@ -339,32 +306,73 @@ Backstory Events:
 - Traumatic experiences or triumphs
 - Secrets or hidden aspects
 - Future aspirations or fears''',
-            'category': categories['Creative'],
-            'tags': ['character', 'story', 'writing', 'creative'],
-            'is_favorite': True
-        }
-    ]
+        'category': 'Creative',
+        'tags': ['character', 'story', 'writing', 'creative'],
+        'is_favorite': True
+    }
+)
 
-    # Create prompts
-    for prompt_data in prompts_data:
-        prompt, created = Prompt.objects.get_or_create(
-            title=prompt_data['title'],
-            defaults={
-                'description': prompt_data['description'],
-                'content': prompt_data['content'],
-                'category': prompt_data['category'],
-                'tags': prompt_data['tags'],
-                'author': regular_user,
-                'is_favorite': prompt_data['is_favorite'],
-                'usage_count': 0,
-            }
+
+@transaction.atomic
+def create_sample_data():
+    """Create sample categories and prompts, committing everything at once"""
+
+    # Create admin user if not exists; create_superuser hashes the password before its one INSERT
+    if not User.objects.filter(username='admin').exists():
+        admin_user = User.objects.create_superuser('admin', 'admin@promptlibrary.com', 'admin123')
+        print(f"Created admin user: {admin_user.username}")
+
+    # Create regular user
+    regular_user = User.objects.filter(username='user').first()
+    if regular_user is None:
+        regular_user = User.objects.create_user(
+            'user', 'user@promptlibrary.com', 'user123',
+            first_name='John',
+            last_name='Doe'
         )
-        if created:
+        print(f"Created regular user: {regular_user.username}")
+
+    # Fetch the existing categories once and insert the missing ones in bulk
+    category_names = [cat_data['name'] for cat_data in _CATEGORIES_DATA]
+    existing_categories = set(
+        Category.objects.filter(name__in=category_names).values_list('name', flat=True)
+    )
+    new_categories = [
+        Category(**cat_data) for cat_data in _CATEGORIES_DATA
+        if cat_data['name'] not in existing_categories
+    ]
+    Category.objects.bulk_create(new_categories, batch_size=BATCH_SIZE, ignore_conflicts=True)
+    for category in new_categories:
+        print(f"Created category: {category.name}")
+    categories = Category.objects.in_bulk(category_names, field_name='name')
+
+    # Create prompts, skipping titles that already exist
+    existing_titles = set(
+        Prompt.objects.filter(
+            title__in=[prompt_data['title'] for prompt_data in _PROMPTS_DATA]
+        ).values_list('title', flat=True)
+    )
+    new_prompts = (
+        Prompt(
+            author=regular_user,
+            usage_count=0,
+            **dict(prompt_data, category=categories[prompt_data['category']], tags=list(prompt_data['tags']))
+        )
+        for prompt_data in _PROMPTS_DATA
+        if prompt_data['title'] not in existing_titles
+    )
+    # Insert in BATCH_SIZE chunks so only one chunk of instances is held at a time
+    while chunk := list(islice(new_prompts, BATCH_SIZE)):
+        Prompt.objects.bulk_create(chunk, batch_size=BATCH_SIZE)
+        # bulk_create skips the post_save receivers, so fill in the search vectors here;
+        # embeddings are backfilled by the first semantic search
+        Prompt.objects.filter(pk__in=[prompt.pk for prompt in chunk]).update_search_vectors()
+        for prompt in chunk:
             print(f"Created prompt: {prompt.title}")
 
     print("\nSeed data creation completed!")
     print(f"Total categories created: {len(categories)}")
-    print(f"Total prompts created: {len(prompts_data)}")
+    print(f"Total prompts created: {len(_PROMPTS_DATA)}")
     print(f"Users: admin/admin123, user/user123")
 
 if __name__ == '__main__':
@@ -5,6 +5,13 @@ from rest_framework.permissions import IsAuthenticated
 from rest_framework.views import APIView
 from django.contrib.auth.models import User
 from django.contrib.auth import authenticate
+from django.db.models import Count, Q
+
+# Annotations UserProfileSerializer reads; apply to User querysets with .annotate(**PROMPT_COUNT_ANNOTATIONS)
+PROMPT_COUNT_ANNOTATIONS = {
+    'prompt_count': Count('prompts'),
+    'favorite_count': Count('prompts', filter=Q(prompts__is_favorite=True)),
+}
 
 
 class UserSerializer(serializers.ModelSerializer):
@@ -30,17 +37,19 @@ class UserProfileSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'username', 'date_joined']
 
     def get_prompt_count(self, obj):
-        try:
-            # Use get_or_create to avoid import issues
-            from prompts.models import Prompt
-            return Prompt.objects.filter(author=obj).count()
-        except:
-            return 0
+        return self._prompt_counts(obj)['prompt_count']
 
     def get_favorite_count(self, obj):
-        try:
-            # Use get_or_create to avoid import issues
-            from prompts.models import Prompt
-            return Prompt.objects.filter(author=obj, is_favorite=True).count()
-        except:
-            return 0
+        return self._prompt_counts(obj)['favorite_count']
+
+    @staticmethod
+    def _prompt_counts(obj):
+        """Both counts, from PROMPT_COUNT_ANNOTATIONS or else one aggregate query kept on obj"""
+        if not hasattr(obj, 'favorite_count'):
+            counts = obj.prompts.aggregate(
+                prompt_count=Count('id'),
+                favorite_count=Count('id', filter=Q(is_favorite=True))
+            )
+            obj.prompt_count = counts['prompt_count']
+            obj.favorite_count = counts['favorite_count']
+        return {'prompt_count': obj.prompt_count, 'favorite_count': obj.favorite_count}
@@ -1,15 +1,13 @@
-from django.urls import path, include
+from django.urls import re_path, include
 from rest_framework.routers import DefaultRouter
 from .views import UserViewSet, LoginView, RegisterView
 
 app_name = 'users'
 
 urlpatterns = [
-    # Auth endpoints under /api/auth/
-    path('login/', LoginView.as_view(), name='auth_login'),
-    path('login', LoginView.as_view()),  # no trailing slash variant
-    path('register/', RegisterView.as_view(), name='auth_register'),
-    path('register', RegisterView.as_view()),  # no trailing slash variant
-    path('me/', UserViewSet.as_view({'get': 'me'}), name='auth_me'),
-    path('me', UserViewSet.as_view({'get': 'me'})),  # no trailing slash variant
+    # Auth endpoints under /api/auth/; one pattern each accepts the path with or without the
+    # trailing slash, since APPEND_SLASH can't redirect a POST; the documented form keeps the slash
+    re_path(r'^login/?$', LoginView.as_view(), name='auth_login'),
+    re_path(r'^register/?$', RegisterView.as_view(), name='auth_register'),
+    re_path(r'^me/?$', UserViewSet.as_view({'get': 'me'}), name='auth_me'),
 ]
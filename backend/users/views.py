@@ -1,15 +1,54 @@
+import hashlib
+
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from rest_framework.parsers import JSONParser
 from rest_framework.views import APIView
+from rest_framework_simplejwt.tokens import RefreshToken
 from django.contrib.auth.models import User
 from django.contrib.auth import authenticate
-from django.db.models import Sum
+from django.db.models import Case, Count, Max, Q, Sum, Value, When
+from django.db.models.functions import Coalesce
 from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import etag
 from django.utils.decorators import method_decorator
-from .serializers import UserSerializer, UserProfileSerializer
+from .serializers import UserSerializer, UserProfileSerializer, PROMPT_COUNT_ANNOTATIONS
+
+
+def registration_conflict(username, email):
+    """Error message if username or email is already taken, checked in one query"""
+    taken = User.objects.filter(Q(username=username) | Q(email=email)).values_list('username', 'email')
+    conflicts = set()
+    for existing_username, existing_email in taken:
+        if existing_username == username:
+            conflicts.add('username')
+        if existing_email == email:
+            conflicts.add('email')
+    if 'username' in conflicts:
+        return 'Username already exists'
+    if 'email' in conflicts:
+        return 'Email already exists'
+    return None
+
+
+def profile_etag(request, *args, **kwargs):
+    """ETag over everything the profile renders; the counts it loads are reused by the serializer"""
+    user = request.user
+    if not user.is_authenticated:
+        return None
+    counts = UserProfileSerializer._prompt_counts(user)
+    digest = hashlib.blake2b(digest_size=16)
+    for value in (user.pk, user.username, user.email, user.first_name, user.last_name,
+                  user.date_joined.isoformat(), counts['prompt_count'], counts['favorite_count']):
+        digest.update(str(value).encode('utf-8'))
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+
+# User columns UserSerializer and UserProfileSerializer render
+USER_FIELDS = ('id', 'username', 'email', 'first_name', 'last_name', 'date_joined')
 
 
 class UserViewSet(viewsets.ModelViewSet):
@@ -20,9 +59,15 @@ class UserViewSet(viewsets.ModelViewSet):
 
     def get_queryset(self):
         # Users can only see their own profile unless they're staff
-        if self.request.user.is_staff:
-            return User.objects.all()
-        return User.objects.filter(id=self.request.user.id)
+        queryset = User.objects.all()
+        if not self.request.user.is_staff:
+            queryset = queryset.filter(id=self.request.user.id)
+        if self.action in ('list', 'retrieve'):
+            # Leave the password hash and permission flags out of read-only rows
+            queryset = queryset.only(*USER_FIELDS)
+        if self.get_serializer_class() is UserProfileSerializer:
+            queryset = queryset.annotate(**PROMPT_COUNT_ANNOTATIONS)
+        return queryset
 
     def get_serializer_class(self):
         if self.action in ['retrieve', 'me']:
@@ -30,6 +75,7 @@ class UserViewSet(viewsets.ModelViewSet):
         return UserSerializer
 
     @action(detail=False, methods=['get'])
+    @method_decorator(etag(profile_etag))
     def me(self, request):
         """Get current user profile"""
         serializer = self.get_serializer(request.user)
@@ -48,18 +94,82 @@ class UserViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=['get'])
     def stats(self, request):
         """Get user statistics"""
-        user = request.user
-
-        stats = {
-            'total_prompts': user.prompts.count(),
-            'favorite_prompts': user.prompts.filter(is_favorite=True).count(),
-            'total_usage': user.prompts.aggregate(total=Sum('usage_count'))['total'] or 0,
-            'categories_used': user.prompts.values('category__name').distinct().count(),
-        }
+        stats = request.user.prompts.aggregate(
+            total_prompts=Count('id'),
+            favorite_prompts=Count('id', filter=Q(is_favorite=True)),
+            total_usage=Coalesce(Sum('usage_count'), 0),
+            # Uncategorized prompts count as one more "category", as a distinct over category names does
+            categories_used=Count('category', distinct=True) + Coalesce(
+                Max(Case(When(category__isnull=True, then=Value(1)), default=Value(0))), 0
+            ),
+        )
 
         return Response(stats)
 
 
+def login_response(request, serializer_class):
+    """Authenticate the posted credentials and issue a JWT pair"""
+    username = request.data.get('username')
+    password = request.data.get('password')
+
+    if not username or not password:
+        return Response(
+            {'error': 'Username and password are required'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    user = authenticate(username=username, password=password)
+    if user:
+        refresh = RefreshToken.for_user(user)
+        return Response({
+            'refresh': str(refresh),
+            'access': str(refresh.access_token),
+            'user': serializer_class(user).data
+        })
+
+    return Response(
+        {'error': 'Invalid credentials'},
+        status=status.HTTP_401_UNAUTHORIZED
+    )
+
+
+def register_response(request, serializer_class):
+    """Create a user from the posted registration data"""
+    username = request.data.get('username')
+    email = request.data.get('email')
+    password = request.data.get('password')
+    first_name = request.data.get('first_name', '')
+    last_name = request.data.get('last_name', '')
+
+    if not username or not email or not password:
+        return Response(
+            {'error': 'Username, email, and password are required'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    conflict = registration_conflict(username, email)
+    if conflict:
+        return Response(
+            {'error': conflict},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    user = User.objects.create_user(
+        username=username,
+        email=email,
+        password=password,
+        first_name=first_name,
+        last_name=last_name
+    )
+    # A new user has no prompts yet
+    user.prompt_count = user.favorite_count = 0
+
+    return Response(
+        serializer_class(user).data,
+        status=status.HTTP_201_CREATED
+    )
+
+
 class AuthView(APIView):
     """Authentication views"""
     permission_classes = [AllowAny]
@@ -78,69 +188,11 @@ class AuthView(APIView):
 
     def login(self, request):
         """User login"""
-        username = request.data.get('username')
-        password = request.data.get('password')
-
-        if not username or not password:
-            return Response(
-                {'error': 'Username and password are required'},
-                status=status.HTTP_400_BAD_REQUEST
-            )
-
-        user = authenticate(username=username, password=password)
-        if user:
-            from rest_framework_simplejwt.tokens import RefreshToken
-            refresh = RefreshToken.for_user(user)
-
-            return Response({
-                'refresh': str(refresh),
-                'access': str(refresh.access_token),
-                'user': UserProfileSerializer(user).data
-            })
-
-        return Response(
-            {'error': 'Invalid credentials'},
-            status=status.HTTP_401_UNAUTHORIZED
-        )
+        return login_response(request, UserProfileSerializer)
 
     def register(self, request):
         """User registration"""
-        username = request.data.get('username')
-        email = request.data.get('email')
-        password = request.data.get('password')
-        first_name = request.data.get('first_name', '')
-        last_name = request.data.get('last_name', '')
-
-        if not username or not email or not password:
-            return Response(
-                {'error': 'Username, email, and password are required'},
-                status=status.HTTP_400_BAD_REQUEST
-            )
-
-        if User.objects.filter(username=username).exists():
-            return Response(
-                {'error': 'Username already exists'},
-                status=status.HTTP_400_BAD_REQUEST
-            )
-
-        if User.objects.filter(email=email).exists():
-            return Response(
-                {'error': 'Email already exists'},
-                status=status.HTTP_400_BAD_REQUEST
-            )
-
-        user = User.objects.create_user(
-            username=username,
-            email=email,
-            password=password,
-            first_name=first_name,
-            last_name=last_name
-        )
-
-        return Response(
-            UserProfileSerializer(user).data,
-            status=status.HTTP_201_CREATED
-        )
+        return register_response(request, UserProfileSerializer)
 
 
 class LoginView(APIView):
@@ -154,29 +206,7 @@ class LoginView(APIView):
         return super().dispatch(*args, **kwargs)
 
     def post(self, request):
-        username = request.data.get('username')
-        password = request.data.get('password')
-
-        if not username or not password:
-            return Response(
-                {'error': 'Username and password are required'},
-                status=status.HTTP_400_BAD_REQUEST
-            )
-
-        user = authenticate(username=username, password=password)
-        if user:
-            from rest_framework_simplejwt.tokens import RefreshToken
-            refresh = RefreshToken.for_user(user)
-            return Response({
-                'refresh': str(refresh),
-                'access': str(refresh.access_token),
-                'user': UserSerializer(user).data
-            })
-
-        return Response(
-            {'error': 'Invalid credentials'},
-            status=status.HTTP_401_UNAUTHORIZED
-        )
+        return login_response(request, UserSerializer)
 
 
 class RegisterView(APIView):
@@ -190,29 +220,4 @@ class RegisterView(APIView):
         return super().dispatch(*args, **kwargs)
 
     def post(self, request):
-        username = request.data.get('username')
-        email = request.data.get('email')
-        password = request.data.get('password')
-        first_name = request.data.get('first_name', '')
-        last_name = request.data.get('last_name', '')
-
-        if not username or not email or not password:
-            return Response(
-                {'error': 'Username, email, and password are required'},
-                status=status.HTTP_400_BAD_REQUEST
-            )
-
-        if User.objects.filter(username=username).exists():
-            return Response({'error': 'Username already exists'}, status=status.HTTP_400_BAD_REQUEST)
-        if User.objects.filter(email=email).exists():
-            return Response({'error': 'Email already exists'}, status=status.HTTP_400_BAD_REQUEST)
-
-        user = User.objects.create_user(
-            username=username,
-            email=email,
-            password=password,
-            first_name=first_name,
-            last_name=last_name
-        )
-
-        return Response(UserSerializer(user).data, status=status.HTTP_201_CREATED)
+        return register_response(request, UserSerializer)